@@ -1,7 +1,26 @@
 import streamlit as st
 import google.generativeai as genai
 import graphviz
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
 import re
+import html
+import base64
+import contextlib
+import io
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import struct
+import subprocess
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+from itertools import repeat
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, as_completed, wait
 
 # --- Configuration ---
 st.set_page_config(
@@ -12,6 +31,145 @@ st.set_page_config(
 
 # --- Gemini API Configuration ---
 # The API key is now configured via the sidebar input.
+MODEL_NAME = 'gemini-2.5-flash'
+# Generation parameters passed to the model; part of the response cache key.
+GENERATION_PARAMS = {}
+
+# --- Cache Configuration ---
+CACHE_DIR = os.environ.get(
+    "MINDMAP_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".mindmap_cache")
+)
+RESPONSE_CACHE_MEMORY_ENTRIES = 128
+RESPONSE_CACHE_DISK_ENTRIES = 5000
+RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 3600
+# Concurrent export renders (each is a Graphviz subprocess, so threads suffice)
+EXPORT_WORKERS = min(4, os.cpu_count() or 1)
+RENDER_CACHE_MAX_BYTES = 256 * 1024 * 1024
+RENDER_CACHE_DISK_MAX_BYTES = 1024 * 1024 * 1024
+# Set MINDMAP_PERSIST_RENDERS=0 to keep rendered exports in memory only
+RENDER_CACHE_PERSIST = os.environ.get("MINDMAP_PERSIST_RENDERS", "1") != "0"
+# Native layouts (coordinates and edge paths) are always persisted under CACHE_DIR/layouts
+LAYOUT_CACHE_MAX_BYTES = 128 * 1024 * 1024
+LAYOUT_CACHE_DISK_MAX_BYTES = 512 * 1024 * 1024
+# Bump when the layout or routing math changes so stale entries are not reused
+LAYOUT_CACHE_VERSION = 3
+# Top-level branches at least this large get their own layout cache entry; smaller ones are cheaper to redo
+BRANCH_LAYOUT_MIN_NODES = 256
+# Minimum seconds between chart redraws while a response is streaming
+STREAM_REDRAW_INTERVAL = 0.25
+
+# --- Layout Configuration ---
+ORIENTATION_MAP = {
+    "Left-Right (LR)": "LR",
+    "Top-Bottom (TB)": "TB",
+    "Right-Left (RL)": "RL",
+    "Bottom-Top (BT)": "BT"
+}
+RADIAL_ORIENTATION = "Radial"
+# Orientations drawn by mirroring another one's layout: option -> (source option, mirrored axis, 0 = x)
+MIRRORED_ORIENTATIONS = {
+    "Right-Left (RL)": ("Left-Right (LR)", 0),
+    "Bottom-Top (BT)": ("Top-Bottom (TB)", 1),
+}
+RENDER_BACKENDS = ["Native Tree Layout", "Graphviz"]
+# Spacing for the native tree layout, in points (Graphviz defaults: ranksep 36, nodesep 18)
+TREE_RANK_GAP = 36.0
+TREE_SIBLING_GAP = 10.0
+TREE_MARGIN = 8.0
+# Approximate glyph advance as a fraction of the font size, used to size node boxes
+TREE_CHAR_WIDTH = 0.6
+
+# --- Style Configuration ---
+# Native SVG options that move or resize elements; changing one re-runs layout.
+# Everything in PAINT_OPTIONS only rewrites the <style> block of the cached SVG
+# (themes and colorblind mode reach it through the colors apply_theme sets).
+LAYOUT_OPTIONS = (
+    "orientation", "font_size", "node_shape", "edge_arrow_size", "edge_routing", "watermark_text", "enable_clustering",
+    "animate_generation"
+)
+PAINT_OPTIONS = (
+    "node_color", "node_border_color", "node_border_width", "node_border_opacity", "edge_color", "edge_style",
+    "edge_opacity", "node_font", "node_font_color", "bg_color", "cluster_palette"
+)
+# Color overrides applied by the theme selector; "Light" and "Custom" keep the pickers
+THEME_PRESETS = {
+    "Dark": dict(node_color="#2E3440", node_border_color="#88C0D0", edge_color="#81A1C1",
+                 node_font_color="#ECEFF4", edge_font_color="#D8DEE9", bg_color="#1E1E1E"),
+}
+# Okabe-Ito colors, distinguishable under the common forms of color blindness
+COLORBLIND_COLORS = dict(node_color="#56B4E9", node_border_color="#000000", edge_color="#E69F00",
+                         node_font_color="#000000", edge_font_color="#000000")
+
+# Outline of nodes a regeneration added, and how many removed nodes are listed by name
+DIFF_ADDED_COLOR = "#2CA02C"
+DIFF_MAX_LISTED = 50
+
+# Generation animation: seconds between node reveals at speed 1.0, capped so the whole timeline stays short
+ANIMATION_NODE_INTERVAL = 0.08
+ANIMATION_MAX_SECONDS = 20.0
+# Minimap: longest side in pixels, pixels per downsampled cell, and the depth up to which edges are drawn
+MINIMAP_SIZE = 240
+MINIMAP_CELL = 2
+MINIMAP_EDGE_DEPTH = 2
+
+# --- Layout Policy ---
+# Node-count thresholds used by the "Auto" graph layout. Orthogonal routing and
+# dot's network-simplex/crossing passes grow super-linearly, so bigger maps
+# trade edge style and layout effort for time, then switch to sfdp.
+# Measured with benchmarks/bench_layout_engines.py (Graphviz 14.1, 2s budget);
+# polylines cost no more than straight lines in dot, so that tier is empty.
+LAYOUT_ORTHO_MAX_NODES = 1000
+LAYOUT_SPLINE_MAX_NODES = 10_000
+LAYOUT_DOT_MAX_NODES = 10_000
+# Time limit for a server-side layout, across all of its fallback tiers and the final render
+LAYOUT_DEADLINE_SECONDS = 10.0
+# Fraction of the time left that each layout tier but the last may spend before falling back
+LAYOUT_TIER_SHARE = 0.5
+# Depth kept by the last-resort preview tier and by progressive rendering's first pass
+LAYOUT_PREVIEW_DEPTH = 3
+# Maps at least this big are drawn to LAYOUT_PREVIEW_DEPTH first, then swapped for the full map
+PROGRESSIVE_MIN_NODES = 2000
+GRAPH_LAYOUT_ENGINES = ["dot", "neato", "fdp", "sfdp", "twopi", "circo"]
+# Clustered dot layouts at least this big run one dot process per top-level branch
+LAYOUT_CLUSTER_PARALLEL_MIN_NODES = 500
+LAYOUT_WORKERS = os.cpu_count() or 1
+# Space left between packed clusters, in points
+LAYOUT_CLUSTER_GAP = 24.0
+# Fill colors for top-level branch clusters, cycled when there are more branches than colors
+GROUP_COLOR_PALETTES = {
+    "Default": ["#E3F2FD", "#E8F5E9", "#FFF3E0", "#F3E5F5", "#E0F7FA", "#FBE9E7", "#F1F8E9", "#EDE7F6"],
+    "Pastel": ["#FFD1DC", "#C1E1C1", "#AEC6CF", "#FDFD96", "#E0BBE4", "#FFDAC1", "#B5EAD7", "#C7CEEA"],
+    "Vivid": ["#E6194B", "#3CB44B", "#FFE119", "#4363D8", "#F58231", "#911EB4", "#42D4F4", "#F032E6"],
+    "Monochrome": ["#F5F5F5", "#E0E0E0", "#CCCCCC", "#B8B8B8", "#A3A3A3", "#8F8F8F", "#7A7A7A", "#666666"],
+}
+
+# --- Export Configuration ---
+# Download button label and MIME type for each graph export format
+EXPORT_FORMATS = {
+    "png": ("Download as PNG", "image/png"),
+    "pdf": ("Download as PDF", "application/pdf"),
+    "svg": ("Download as SVG", "image/svg+xml"),
+}
+# High-resolution PNG export is rasterized in full-width bands of at most this many pixels
+HIGH_RES_BAND_PIXELS = 4 * 1024 * 1024
+HIGH_RES_DEFAULT_DPI = 300
+HIGH_RES_DEFAULT_MAX_MEGAPIXELS = 200
+# The native backend rasterizes its PNG export at screen resolution and its PDF export sharper, for print
+NATIVE_PNG_DPI = 72
+NATIVE_PDF_DPI = 144
+# With collapse enabled, the HTML export opens with subtrees at this depth and below folded
+HTML_EXPORT_INITIAL_DEPTH = 2
+GRAPHVIZ_INSTALL_HELP = (
+    "Graphviz PNG export requires Graphviz installed on the server.\n\n"
+    "To enable PNG export, install Graphviz:\n"
+    "- **Windows:** Download and install from https://graphviz.gitlab.io/_pages/Download/Download_windows.html and add Graphviz to your PATH.\n"
+    "- **macOS:** Run `brew install graphviz` in Terminal.\n"
+    "- **Linux (Debian/Ubuntu):** Run `sudo apt-get install graphviz`.\n"
+    "- **Linux (Fedora):** Run `sudo dnf install graphviz`.\n"
+    "After installation, restart your app/server."
+)
+
 # --- Prompt Template ---
 MIND_MAP_PROMPT = """
 You are an expert mind map creator.
@@ -38,28 +196,326 @@ The root of the mind map should be the topic itself.
 **Generate a mind map for the topic:** "{topic}"
 """
 
+# --- HTML Export Template ---
+# Filled in by build_html_export. The layout arrives as a deflated, base64 payload
+# and is drawn on a canvas, so file size and load time grow with the node count
+# rather than with the SVG markup for every element.
+HTML_EXPORT_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+:root { __STYLE_VARIABLES__ }
+html, body { margin: 0; height: 100%; overflow: hidden; background: var(--background); font-family: sans-serif; }
+#map { display: block; width: 100vw; height: 100vh; cursor: grab; touch-action: none; }
+#toolbar { position: fixed; top: 8px; left: 8px; display: flex; gap: 6px; align-items: center; font-size: 13px; }
+#toolbar button { padding: 2px 8px; }
+#status { color: var(--label-fill); }
+__CUSTOM_CSS__
+</style>
+</head>
+<body>
+<canvas id="map"></canvas>
+<div id="toolbar">
+<button id="fit">Fit</button>
+<button id="expand-all" hidden>Expand all</button>
+<button id="collapse-all" hidden>Collapse all</button>
+<span id="status">Loading...</span>
+</div>
+<script id="payload" type="application/octet-stream">__PAYLOAD__</script>
+<script>
+"use strict";
+(async function () {
+  const COLLAPSIBLE = __COLLAPSIBLE__;
+  const INITIAL_DEPTH = __INITIAL_DEPTH__;
+
+  // Payload: uint32 meta length, JSON meta padded to 4 bytes, then little-endian arrays
+  const encoded = atob(document.getElementById("payload").textContent.trim());
+  const compressed = Uint8Array.from(encoded, (c) => c.charCodeAt(0));
+  const stream = new Blob([compressed]).stream().pipeThrough(new DecompressionStream("deflate"));
+  const buffer = await new Response(stream).arrayBuffer();
+  const metaLength = new DataView(buffer).getUint32(0, true);
+  const meta = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, metaLength)));
+  let offset = 4 + metaLength;
+  function take(Type, count) {
+    const array = new Type(buffer, offset, count);
+    offset += count * 4;
+    return array;
+  }
+  const n = meta.nodes, edges = meta.edges, perEdge = meta.points_per_edge, trunkCount = meta.trunks;
+  const x = take(Float32Array, n), y = take(Float32Array, n);
+  const w = take(Float32Array, n), h = take(Float32Array, n);
+  const parents = take(Int32Array, n), depth = take(Int32Array, n);
+  const edgeChildren = take(Int32Array, edges);
+  const points = take(Float32Array, edges * perEdge * 2);
+  const trunks = take(Float32Array, trunkCount * 4);
+  const trunkParents = take(Int32Array, trunkCount);
+  const labels = meta.labels;
+
+  const css = getComputedStyle(document.documentElement);
+  const variable = (name) => css.getPropertyValue(name).trim();
+  const style = {
+    background: variable("--background"), nodeFill: variable("--node-fill"), nodeStroke: variable("--node-stroke"),
+    nodeStrokeWidth: parseFloat(variable("--node-stroke-width")) || 1, edgeStroke: variable("--edge-stroke"),
+    edgeWidth: parseFloat(variable("--edge-width")) || 1, hoverFill: variable("--hover-fill"),
+    labelFill: variable("--label-fill"), labelFont: variable("--label-font"), fontSize: parseFloat(variable("--font-size")) || 12,
+  };
+  const dash = { dashed: [5, 5], dotted: [1, 4] }[meta.edge_style] || [];
+
+  // Outline order puts every parent before its children, so one forward pass settles visibility
+  const hasChildren = new Uint8Array(n), collapsed = new Uint8Array(n), visible = new Uint8Array(n);
+  for (let i = 0; i < n; i++) if (parents[i] >= 0) hasChildren[parents[i]] = 1;
+  const status = document.getElementById("status");
+  function updateVisibility() {
+    let shown = 0;
+    for (let i = 0; i < n; i++) {
+      const p = parents[i];
+      visible[i] = p < 0 || (visible[p] && !collapsed[p]) ? 1 : 0;
+      shown += visible[i];
+    }
+    status.textContent = shown + " of " + n + " nodes";
+  }
+  function collapseFrom(level) {
+    for (let i = 0; i < n; i++) collapsed[i] = hasChildren[i] && depth[i] >= level ? 1 : 0;
+    updateVisibility();
+    schedule();
+  }
+
+  const canvas = document.getElementById("map");
+  const ctx = canvas.getContext("2d");
+  let scale = 1, panX = 0, panY = 0, hovered = -1, pending = false;
+  function schedule() {
+    if (!pending) {
+      pending = true;
+      requestAnimationFrame(() => { pending = false; draw(); });
+    }
+  }
+  function fit() {
+    const width = canvas.clientWidth, height = canvas.clientHeight;
+    scale = Math.min(width / meta.size[0], height / meta.size[1]) * 0.95;
+    panX = (width - meta.size[0] * scale) / 2;
+    panY = (height - meta.size[1] * scale) / 2;
+    schedule();
+  }
+  function nodePath(i) {
+    const cx = x[i], cy = y[i], hw = w[i] / 2, hh = h[i] / 2;
+    if (meta.node_shape === "ellipse" || meta.node_shape === "circle") {
+      ctx.moveTo(cx + hw, cy);
+      ctx.ellipse(cx, cy, hw, hh, 0, 0, 2 * Math.PI);
+    } else if (meta.node_shape === "diamond") {
+      ctx.moveTo(cx, cy - hh); ctx.lineTo(cx + hw, cy); ctx.lineTo(cx, cy + hh); ctx.lineTo(cx - hw, cy); ctx.closePath();
+    } else if (meta.node_shape === "hexagon") {
+      const q = hw / 2;
+      ctx.moveTo(cx - hw, cy); ctx.lineTo(cx - q, cy - hh); ctx.lineTo(cx + q, cy - hh);
+      ctx.lineTo(cx + hw, cy); ctx.lineTo(cx + q, cy + hh); ctx.lineTo(cx - q, cy + hh); ctx.closePath();
+    } else {
+      ctx.roundRect(cx - hw, cy - hh, 2 * hw, 2 * hh, Math.min(hw, hh) / 2);
+    }
+  }
+  function draw() {
+    const ratio = window.devicePixelRatio || 1;
+    const width = canvas.clientWidth, height = canvas.clientHeight;
+    if (canvas.width !== Math.round(width * ratio) || canvas.height !== Math.round(height * ratio)) {
+      canvas.width = Math.round(width * ratio);
+      canvas.height = Math.round(height * ratio);
+    }
+    ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+    ctx.fillStyle = style.background;
+    ctx.fillRect(0, 0, width, height);
+    ctx.setTransform(ratio * scale, 0, 0, ratio * scale, ratio * panX, ratio * panY);
+    // Window in layout coordinates; anything entirely outside it is skipped
+    const left = -panX / scale, top = -panY / scale, right = left + width / scale, bottom = top + height / scale;
+    const outside = (x0, y0, x1, y1) => Math.max(x0, x1) < left || Math.min(x0, x1) > right || Math.max(y0, y1) < top || Math.min(y0, y1) > bottom;
+
+    ctx.strokeStyle = style.edgeStroke;
+    ctx.fillStyle = style.edgeStroke;
+    ctx.lineWidth = style.edgeWidth;
+    ctx.setLineDash(dash);
+    ctx.beginPath();
+    for (let t = 0; t < trunkCount; t++) {
+      const p = trunkParents[t], b = t * 4;
+      if (!visible[p] || collapsed[p] || outside(trunks[b], trunks[b + 1], trunks[b + 2], trunks[b + 3])) continue;
+      ctx.moveTo(trunks[b], trunks[b + 1]);
+      ctx.lineTo(trunks[b + 2], trunks[b + 3]);
+    }
+    const arrowTips = [];
+    for (let e = 0; e < edges; e++) {
+      if (!visible[edgeChildren[e]]) continue;
+      const b = e * perEdge * 2, last = b + (perEdge - 1) * 2;
+      if (outside(points[b], points[b + 1], points[last], points[last + 1]) && outside(x[edgeChildren[e]], y[edgeChildren[e]], points[b], points[b + 1])) continue;
+      ctx.moveTo(points[b], points[b + 1]);
+      for (let k = b + 2; k <= last; k += 2) ctx.lineTo(points[k], points[k + 1]);
+      arrowTips.push(last);
+    }
+    ctx.stroke();
+    ctx.setLineDash([]);
+    const arrow = 7 * meta.arrow_size;
+    if (arrow * scale >= 2) {
+      ctx.beginPath();
+      for (const last of arrowTips) {
+        const tx = points[last], ty = points[last + 1];
+        let dx = tx - points[last - 2], dy = ty - points[last - 1];
+        const length = Math.hypot(dx, dy) || 1;
+        dx /= length; dy /= length;
+        ctx.moveTo(tx, ty);
+        ctx.lineTo(tx - dx * arrow - dy * arrow / 2, ty - dy * arrow + dx * arrow / 2);
+        ctx.lineTo(tx - dx * arrow + dy * arrow / 2, ty - dy * arrow - dx * arrow / 2);
+        ctx.closePath();
+      }
+      ctx.fill();
+    }
+
+    const onScreen = [];
+    ctx.beginPath();
+    for (let i = 0; i < n; i++) {
+      if (!visible[i] || outside(x[i] - w[i] / 2, y[i] - h[i] / 2, x[i] + w[i] / 2, y[i] + h[i] / 2)) continue;
+      nodePath(i);
+      onScreen.push(i);
+    }
+    ctx.fillStyle = style.nodeFill;
+    ctx.fill();
+    ctx.strokeStyle = style.nodeStroke;
+    ctx.lineWidth = style.nodeStrokeWidth;
+    ctx.stroke();
+    if (hovered >= 0 && visible[hovered]) {
+      ctx.beginPath();
+      nodePath(hovered);
+      ctx.fillStyle = style.hoverFill;
+      ctx.fill();
+      ctx.stroke();
+    }
+    // Collapsed nodes get a marker on their far side
+    ctx.fillStyle = style.nodeStroke;
+    ctx.beginPath();
+    for (const i of onScreen) {
+      if (!collapsed[i]) continue;
+      const r = Math.min(w[i], h[i]) / 6;
+      ctx.moveTo(x[i] + w[i] / 2 + r, y[i]);
+      ctx.arc(x[i] + w[i] / 2, y[i], r, 0, 2 * Math.PI);
+    }
+    ctx.fill();
+    // Labels are skipped once they would be too small to read
+    if (style.fontSize * scale >= 4) {
+      ctx.fillStyle = style.labelFill;
+      ctx.font = style.fontSize + "px " + style.labelFont;
+      ctx.textAlign = "center";
+      ctx.textBaseline = "middle";
+      for (const i of onScreen) ctx.fillText(labels[i], x[i], y[i]);
+    }
+  }
+  function nodeAt(clientX, clientY) {
+    const rect = canvas.getBoundingClientRect();
+    const px = (clientX - rect.left - panX) / scale, py = (clientY - rect.top - panY) / scale;
+    for (let i = n - 1; i >= 0; i--) {
+      if (visible[i] && Math.abs(px - x[i]) <= w[i] / 2 && Math.abs(py - y[i]) <= h[i] / 2) return i;
+    }
+    return -1;
+  }
+
+  let drag = null;
+  canvas.addEventListener("pointerdown", (event) => {
+    drag = { x: event.clientX, y: event.clientY, panX, panY, moved: false };
+    canvas.setPointerCapture(event.pointerId);
+    canvas.style.cursor = "grabbing";
+  });
+  canvas.addEventListener("pointermove", (event) => {
+    if (drag) {
+      const dx = event.clientX - drag.x, dy = event.clientY - drag.y;
+      drag.moved = drag.moved || Math.hypot(dx, dy) > 3;
+      panX = drag.panX + dx;
+      panY = drag.panY + dy;
+      schedule();
+    } else {
+      const node = nodeAt(event.clientX, event.clientY);
+      if (node !== hovered) {
+        hovered = node;
+        canvas.title = node >= 0 ? labels[node] : "";
+        schedule();
+      }
+    }
+  });
+  canvas.addEventListener("pointerup", (event) => {
+    canvas.style.cursor = "grab";
+    const click = drag && !drag.moved;
+    drag = null;
+    if (!click || !COLLAPSIBLE) return;
+    const node = nodeAt(event.clientX, event.clientY);
+    if (node >= 0 && hasChildren[node]) {
+      collapsed[node] ^= 1;
+      updateVisibility();
+      schedule();
+    }
+  });
+  canvas.addEventListener("wheel", (event) => {
+    event.preventDefault();
+    const rect = canvas.getBoundingClientRect();
+    const cx = event.clientX - rect.left, cy = event.clientY - rect.top;
+    const factor = Math.exp(-event.deltaY * 0.0015);
+    panX = cx - (cx - panX) * factor;
+    panY = cy - (cy - panY) * factor;
+    scale *= factor;
+    schedule();
+  }, { passive: false });
+  window.addEventListener("resize", schedule);
+  document.getElementById("fit").addEventListener("click", fit);
+  if (COLLAPSIBLE) {
+    const expandAll = document.getElementById("expand-all"), collapseAll = document.getElementById("collapse-all");
+    expandAll.hidden = collapseAll.hidden = false;
+    expandAll.addEventListener("click", () => collapseFrom(Infinity));
+    collapseAll.addEventListener("click", () => collapseFrom(1));
+    collapseFrom(INITIAL_DEPTH);
+  } else {
+    updateVisibility();
+  }
+  fit();
+})();
+</script>
+</body>
+</html>
+"""
+
 # --- Helper Functions ---
 
-def generate_unique_node_id(text, existing_ids):
-    """Generates a unique, safe ID for a graphviz node."""
-    base_id = re.sub(r'\W+', '_', text).lower()
-    node_id = base_id
-    counter = 1
-    while node_id in existing_ids:
-        node_id = f"{base_id}_{counter}"
-        counter += 1
-    return node_id
-
-def parse_markdown_to_graphviz(markdown_text: str, topic: str, orientation: str = "LR", font_size: int = 12, node_color: str = "#ADD8E6", max_depth: int = 5,
+class NodeIdAllocator:
+    """
+    Allocates unique, safe IDs for graphviz nodes in amortized O(1) per node.
+    "readable" IDs are the sanitized label plus a per-base counter suffix;
+    "path" IDs hash the node's label path so they stay the same across
+    regenerations as long as the branch leading to the node is unchanged.
+    """
+
+    def __init__(self, scheme: str = "readable"):
+        self.scheme = scheme
+        self._used = set()
+        self._counters = {}
+
+    def allocate(self, text: str, parent_digest: bytes = b"", occurrence: int = 0):
+        """Returns (node_id, path_digest) for a node labelled text."""
+        digest = hashlib.blake2b(
+            parent_digest + text.encode("utf-8") + b"\0" + str(occurrence).encode("ascii"), digest_size=8
+        ).digest()
+        base_id = "n" + digest.hex() if self.scheme == "path" else re.sub(r'\W+', '_', text).lower()
+        node_id = base_id
+        if node_id in self._used:
+            # Resume from the last suffix handed out for this base instead of probing from 1
+            counter = self._counters.get(base_id, 1)
+            node_id = f"{base_id}_{counter}"
+            while node_id in self._used:
+                counter += 1
+                node_id = f"{base_id}_{counter}"
+            self._counters[base_id] = counter + 1
+        self._used.add(node_id)
+        return node_id, digest
+
+def _new_mind_map_digraph(topic: str, orientation: str = "LR", font_size: int = 12, node_color: str = "#ADD8E6",
     node_border_color: str = "#000000", node_border_width: int = 2, edge_color: str = "#888888", edge_style: str = "solid",
     edge_arrow_size: float = 1.0, node_shape: str = "box", node_font: str = "Helvetica", node_font_color: str = "#000000",
-    edge_font_color: str = "#333333", edge_font_size: int = 12, bg_color: str = "#FFFFFF", custom_root: str = "", hide_leaf_nodes: bool = False
+    edge_font_color: str = "#333333", edge_font_size: int = 12, bg_color: str = "#FFFFFF",
+    engine: str = "dot", splines: str = "ortho", layout_attrs: dict = None
 ) -> graphviz.Digraph:
-    """
-    Parses a markdown nested list into a graphviz Digraph object.
-    Supports many advanced options.
-    """
-    dot = graphviz.Digraph('MindMap', comment=f'Mind Map for {topic}')
+    """Creates an empty Digraph with the mind map styling applied."""
+    dot = graphviz.Digraph('MindMap', comment=f'Mind Map for {topic}', engine=engine)
     dot.attr('graph', bgcolor=bg_color)
     dot.attr(
         'node',
@@ -81,70 +537,2086 @@ def parse_markdown_to_graphviz(markdown_text: str, topic: str, orientation: str
         fontsize=str(edge_font_size),
         fontcolor=edge_font_color
     )
-    orientation_map = {
-        "Left-Right (LR)": "LR",
-        "Top-Bottom (TB)": "TB",
-        "Right-Left (RL)": "RL",
-        "Bottom-Top (BT)": "BT"
-    }
-    dot.attr(rankdir=orientation_map.get(orientation, "LR"), splines='ortho')
+    dot.attr(rankdir=ORIENTATION_MAP.get(orientation, "LR"), splines=splines, **(layout_attrs or {}))
+    return dot
 
-    lines = markdown_text.strip().split('\n')
-    parent_stack = []
-    existing_ids = set()
-    node_count = 0
+class OutlineNode:
+    """Lightweight view of a single node in an OutlineTree."""
+    __slots__ = ("_tree", "index")
 
-    for idx, line in enumerate(lines):
-        if not line.strip():
-            continue
+    def __init__(self, tree, index: int):
+        self._tree = tree
+        self.index = index
+
+    @property
+    def parent(self) -> int:
+        """Index of the parent node, or -1 for a root."""
+        return self._tree.parents[self.index]
+
+    @property
+    def depth(self) -> int:
+        return self._tree.depths[self.index]
 
+    @property
+    def label(self) -> str:
+        return self._tree.label(self.index)
+
+    @property
+    def node_id(self) -> str:
+        return self._tree.node_id(self.index)
+
+    def __repr__(self):
+        return f"OutlineNode({self.index}, {self.label!r})"
+
+class OutlineTree:
+    """
+    Parsed mind map outline, independent of any renderer.
+    Nodes are stored in parallel arrays (parent index, depth) with labels and
+    node IDs packed into single string buffers addressed by offsets.
+    """
+    __slots__ = ("parents", "depths", "label_offsets", "labels_buffer", "id_offsets", "ids_buffer")
+
+    def __init__(self, parents, depths, label_offsets, labels_buffer, id_offsets, ids_buffer):
+        self.parents = parents
+        self.depths = depths
+        self.label_offsets = label_offsets
+        self.labels_buffer = labels_buffer
+        self.id_offsets = id_offsets
+        self.ids_buffer = ids_buffer
+
+    def __len__(self):
+        return len(self.parents)
+
+    def __getitem__(self, index: int) -> OutlineNode:
+        if not 0 <= index < len(self.parents):
+            raise IndexError(index)
+        return OutlineNode(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.parents)):
+            yield OutlineNode(self, index)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.parents)
+
+    def label(self, index: int) -> str:
+        return self.labels_buffer[self.label_offsets[index]:self.label_offsets[index + 1]]
+
+    def node_id(self, index: int) -> str:
+        return self.ids_buffer[self.id_offsets[index]:self.id_offsets[index + 1]]
+
+    @property
+    def edge_count(self) -> int:
+        return sum(1 for parent in self.parents if parent >= 0)
+
+    def prune(self, max_depth: int):
+        """Returns a new tree keeping only nodes less than max_depth edges below a root."""
+        edge_depths = array('H')
+        new_index = array('i')
+        parents, depths = array('i'), array('H')
+        label_offsets, labels = array('I', [0]), []
+        id_offsets, ids = array('I', [0]), []
+        for index, parent in enumerate(self.parents):
+            # Parents always precede their children, so one forward pass suffices
+            depth = edge_depths[parent] + 1 if parent >= 0 else 0
+            edge_depths.append(depth)
+            if depth >= max_depth or (parent >= 0 and new_index[parent] < 0):
+                new_index.append(-1)
+                continue
+            new_index.append(len(parents))
+            parents.append(new_index[parent] if parent >= 0 else -1)
+            depths.append(self.depths[index])
+            label = self.label(index)
+            labels.append(label)
+            label_offsets.append(label_offsets[-1] + len(label))
+            node_id = self.node_id(index)
+            ids.append(node_id)
+            id_offsets.append(id_offsets[-1] + len(node_id))
+        return OutlineTree(parents, depths, label_offsets, "".join(labels), id_offsets, "".join(ids))
+
+    def label_path(self, index: int) -> list:
+        """Labels from the root down to the node."""
+        path = []
+        while index >= 0:
+            path.append(self.label(index))
+            index = self.parents[index]
+        return path[::-1]
+
+class OutlineParser:
+    """
+    Incrementally parses a markdown nested list into an OutlineTree.
+    Text can be fed in arbitrary chunks (e.g. while the model response is
+    streaming); nodes are added as soon as their line is complete.
+    """
+
+    def __init__(self, max_depth: int = 5, custom_root: str = "", hide_leaf_nodes: bool = False, id_scheme: str = "readable"):
+        self.max_depth = max_depth
+        self.custom_root = custom_root
+        self.hide_leaf_nodes = hide_leaf_nodes
+        self._parents = array('i')
+        self._depths = array('H')
+        self._label_offsets = array('I', [0])
+        self._labels = []
+        self._id_offsets = array('I', [0])
+        self._ids = []
+        self._buffer = ""
+        self._started = False
+        self._parent_stack = []
+        self._id_allocator = NodeIdAllocator(id_scheme)
+        # Occurrences of each (parent, label) pair, so duplicate siblings get distinct path IDs
+        self._sibling_counts = {}
+        # With hide_leaf_nodes, a node is only added once the next line shows it has children.
+        self._pending = None
+        self._pending_next_level = None
+
+    @property
+    def node_count(self) -> int:
+        return len(self._parents)
+
+    def feed(self, chunk: str) -> int:
+        """Consumes a chunk of outline text. Returns the number of nodes added."""
+        before = self.node_count
+        self._buffer += chunk
+        if not self._started:
+            # Mirrors markdown_text.strip() on the full outline
+            self._buffer = self._buffer.lstrip()
+            self._started = bool(self._buffer)
+        *lines, self._buffer = self._buffer.split('\n')
+        for line in lines:
+            self._feed_line(line)
+        return self.node_count - before
+
+    def snapshot(self) -> OutlineTree:
+        """Returns a tree of the nodes parsed so far."""
+        return OutlineTree(
+            array('i', self._parents), array('H', self._depths),
+            array('I', self._label_offsets), "".join(self._labels),
+            array('I', self._id_offsets), "".join(self._ids)
+        )
+
+    def finish(self) -> OutlineTree:
+        """Flushes the remaining text and returns the completed tree."""
+        if self._buffer.strip():
+            self._feed_line(self._buffer)
+        self._buffer = ""
+        if self._pending:
+            self._add_node(*self._pending)
+            self._pending = None
+        return OutlineTree(
+            self._parents, self._depths,
+            self._label_offsets, "".join(self._labels),
+            self._id_offsets, "".join(self._ids)
+        )
+
+    def _feed_line(self, line: str):
         stripped_line = line.lstrip()
         indentation = len(line) - len(stripped_line)
         level = indentation // 2
 
-        if level >= max_depth:
-            continue
+        if self._pending and self._pending_next_level is None:
+            self._pending_next_level = level
+        if not stripped_line:
+            # Trailing blank lines are stripped, so a blank line only decides
+            # the pending node once more content follows it.
+            return
+
+        if self._pending:
+            if self._pending_next_level > self._pending[0]:
+                self._add_node(*self._pending)
+            self._pending = None
+
+        if level >= self.max_depth:
+            return
 
         node_text = stripped_line.lstrip('- ').strip()
-        if custom_root and level == 0:
-            node_text = custom_root
+        if self.custom_root and level == 0:
+            node_text = self.custom_root
 
-        node_id = generate_unique_node_id(node_text, existing_ids)
-        existing_ids.add(node_id)
+        parent = None
+        for entry in reversed(self._parent_stack):
+            if entry[0] < level:
+                parent = entry
+                break
+        parent_index, parent_digest = (parent[1], parent[2]) if parent else (-1, b"")
+        sibling_key = (parent_index, node_text)
+        occurrence = self._sibling_counts.get(sibling_key, 0)
+        self._sibling_counts[sibling_key] = occurrence + 1
+        node_id, digest = self._id_allocator.allocate(node_text, parent_digest, occurrence)
 
         # Hide leaf nodes if enabled
-        if hide_leaf_nodes and idx + 1 < len(lines):
-            next_line = lines[idx + 1]
-            next_indentation = len(next_line) - len(next_line.lstrip())
-            next_level = next_indentation // 2
-            if next_level <= level:
-                continue
+        if self.hide_leaf_nodes:
+            self._pending = (level, node_id, node_text, digest)
+            self._pending_next_level = None
+            return
 
-        dot.node(node_id, node_text)
-        node_count += 1
+        self._add_node(level, node_id, node_text, digest)
 
-        while parent_stack and parent_stack[-1][0] >= level:
-            parent_stack.pop()
+    def _add_node(self, level: int, node_id: str, node_text: str, digest: bytes):
+        index = len(self._parents)
 
-        if parent_stack:
-            parent_id = parent_stack[-1][1]
-            dot.edge(parent_id, node_id)
+        while self._parent_stack and self._parent_stack[-1][0] >= level:
+            self._parent_stack.pop()
 
-        parent_stack.append((level, node_id))
+        self._parents.append(self._parent_stack[-1][1] if self._parent_stack else -1)
+        self._depths.append(level)
+        self._labels.append(node_text)
+        self._label_offsets.append(self._label_offsets[-1] + len(node_text))
+        self._ids.append(node_id)
+        self._id_offsets.append(self._id_offsets[-1] + len(node_id))
 
-    # Add watermark if enabled
-    if add_watermark and watermark_text:
+        self._parent_stack.append((level, index, digest))
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def parse_outline(markdown_text: str, max_depth: int = 5, custom_root: str = "", hide_leaf_nodes: bool = False,
+    id_scheme: str = "readable"
+) -> OutlineTree:
+    """Parses a markdown nested list into an OutlineTree (cached per outline and parse options)."""
+    parser = OutlineParser(max_depth=max_depth, custom_root=custom_root, hide_leaf_nodes=hide_leaf_nodes, id_scheme=id_scheme)
+    parser.feed(markdown_text)
+    return parser.finish()
+
+def _label_path_keys(tree: OutlineTree, paths: dict) -> list:
+    """
+    Numbers every node by its normalized label path and its occurrence among
+    same-label siblings (so repeated siblings such as "Examples" are told
+    apart); paths holds the numbering shared across trees.
+    """
+    keys = []
+    # Occurrences of each (parent key, label) pair, as OutlineParser counts them for path IDs
+    sibling_counts = {}
+    for index, parent in enumerate(tree.parents):
+        label = " ".join(tree.label(index).casefold().split())
+        sibling_key = (keys[parent] if parent >= 0 else -1, label)
+        occurrence = sibling_counts.get(sibling_key, 0)
+        sibling_counts[sibling_key] = occurrence + 1
+        keys.append(paths.setdefault((*sibling_key, occurrence), len(paths)))
+    return keys
+
+def diff_outline_trees(old: OutlineTree, new: OutlineTree):
+    """
+    Matches nodes of two outlines by normalized label path (the labels from
+    the root down, ignoring case and whitespace; the nth of several same-label
+    siblings matches the nth), so a renamed node counts as removed and added
+    together with its whole subtree. Returns (added,
+    removed): a boolean mask over new's nodes and the unmatched indices in old.
+    """
+    paths = {}
+    old_keys = _label_path_keys(old, paths)
+    new_keys = _label_path_keys(new, paths)
+    old_set, new_set = set(old_keys), set(new_keys)
+    added = np.fromiter((key not in old_set for key in new_keys), dtype=bool, count=len(new_keys))
+    removed = [index for index, key in enumerate(old_keys) if key not in new_set]
+    return added, removed
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def outline_changes(previous_markdown: str, markdown_text: str, max_depth: int = 5, custom_root: str = "",
+    hide_leaf_nodes: bool = False, id_scheme: str = "readable"
+):
+    """diff_outline_trees for two outlines parsed with the same options (cached per pair)."""
+    options = dict(max_depth=max_depth, custom_root=custom_root, hide_leaf_nodes=hide_leaf_nodes, id_scheme=id_scheme)
+    return diff_outline_trees(parse_outline(previous_markdown, **options), parse_outline(markdown_text, **options))
+
+def choose_layout_policy(node_count: int, edge_count: int, graph_layout: str = "Auto", radial: bool = False) -> dict:
+    """
+    Picks the layout engine, spline mode and dot effort limits for a graph size.
+    An explicit graph_layout is honored; "Auto" also picks the engine.
+    """
+    size = max(node_count, edge_count)
+    if graph_layout == "Auto":
+        engine = "sfdp" if size > LAYOUT_DOT_MAX_NODES else "twopi" if radial else "dot"
+    else:
+        engine = graph_layout
+    layout_attrs = {}
+    if size <= LAYOUT_ORTHO_MAX_NODES:
+        splines = "ortho"
+    elif size <= LAYOUT_SPLINE_MAX_NODES:
+        splines = "polyline"
+        if engine == "dot":
+            layout_attrs.update(nslimit="8", mclimit="0.5")
+    else:
+        splines = "line"
+        if engine == "dot":
+            # Cap network-simplex iterations and crossing minimization passes
+            layout_attrs.update(nslimit="2", nslimit1="2", mclimit="0.2", searchsize="10")
+        elif engine == "sfdp":
+            layout_attrs.update(overlap="prism")
+    return {"engine": engine, "splines": splines, "layout_attrs": layout_attrs}
+
+# Identifiers DOT accepts unquoted (same rule as graphviz.quoting.ID)
+_DOT_BARE_ID = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*|-?(\.[0-9]+|[0-9]+(\.[0-9]*)?))$')
+_DOT_KEYWORDS = {'node', 'edge', 'graph', 'digraph', 'subgraph', 'strict'}
+
+def _dot_quote(text: str) -> str:
+    """graphviz.quoting.quote with a fast path for identifiers that need no quoting."""
+    if _DOT_BARE_ID.match(text) and text.lower() not in _DOT_KEYWORDS:
+        return text
+    return graphviz.quoting.quote(text)
+
+def iter_dot_body(tree: OutlineTree):
+    """
+    Yields the node and edge statements for a tree, formatted exactly like
+    Digraph.node()/Digraph.edge() would, without their per-call overhead.
+    """
+    parents = tree.parents
+    for index in range(len(tree)):
+        node_id = _dot_quote(tree.node_id(index))
+        yield f"\t{node_id} [label={_dot_quote(tree.label(index))}]\n"
+        parent = parents[index]
+        if parent >= 0:
+            yield f"\t{_dot_quote(tree.node_id(parent))} -> {node_id}\n"
+
+def _cluster_color(cluster: int, palette: str) -> str:
+    colors = GROUP_COLOR_PALETTES.get(palette, GROUP_COLOR_PALETTES["Default"])
+    return colors[cluster % len(colors)]
+
+def _cluster_header(cluster: int, palette: str, **attrs) -> str:
+    color = _cluster_color(cluster, palette)
+    extra = "".join(f" {name}={_dot_quote(value)}" for name, value in attrs.items())
+    return f'\tsubgraph cluster_{cluster} {{\n\t\tgraph [color="{color}" fillcolor="{color}" label="" style="rounded,filled"{extra}]\n'
+
+def iter_clustered_dot_body(tree: OutlineTree, palette: str = "Default"):
+    """
+    Like iter_dot_body, but wraps every top-level branch in a
+    "subgraph cluster_N" filled from the palette. The shared root and the
+    edges into each branch stay outside, since DOT adds every node named
+    inside a subgraph to it.
+    """
+    parents = np.frombuffer(tree.parents, dtype=np.int32)
+    clusters = branch_clusters(parents)
+    for index in np.flatnonzero(clusters < 0).tolist():
+        yield f"\t{_dot_quote(tree.node_id(index))} [label={_dot_quote(tree.label(index))}]\n"
+    order = np.argsort(clusters, kind="stable")
+    bounds = np.searchsorted(clusters[order], np.arange(int(clusters.max()) + 2))
+    for cluster in range(int(clusters.max()) + 1):
+        yield _cluster_header(cluster, palette)
+        for index in order[bounds[cluster]:bounds[cluster + 1]].tolist():
+            node_id = _dot_quote(tree.node_id(index))
+            yield f"\t\t{node_id} [label={_dot_quote(tree.label(index))}]\n"
+            parent = parents[index]
+            if parent >= 0 and clusters[parent] == cluster:
+                yield f"\t\t{_dot_quote(tree.node_id(parent))} -> {node_id}\n"
+        yield "\t}\n"
+    for index in np.flatnonzero((parents >= 0) & (clusters != clusters[np.maximum(parents, 0)])).tolist():
+        yield f"\t{_dot_quote(tree.node_id(parents[index]))} -> {_dot_quote(tree.node_id(index))}\n"
+
+def _styled_digraph(tree: OutlineTree, topic: str, graph_layout: str = "Auto", **style) -> graphviz.Digraph:
+    policy = choose_layout_policy(
+        tree.node_count, tree.edge_count, graph_layout, radial=style.get("orientation") == RADIAL_ORIENTATION
+    )
+    return _new_mind_map_digraph(topic, **policy, **style)
+
+def _add_watermark(dot: graphviz.Digraph, watermark_text: str):
+    if watermark_text:
         dot.attr(label=watermark_text, fontsize="10", fontcolor="#CCCCCC", labelloc="b", labeljust="r")
 
-    return dot, node_count
+def build_mind_map_digraph(tree: OutlineTree, topic: str, watermark_text: str = "", graph_layout: str = "Auto",
+    cluster_palette: str = None, **style
+) -> graphviz.Digraph:
+    """Renders a parsed outline as a styled graphviz Digraph, with branch clusters if cluster_palette is set."""
+    dot = _styled_digraph(tree, topic, graph_layout, **style)
+    dot.body.extend(iter_clustered_dot_body(tree, cluster_palette) if cluster_palette and len(tree) else iter_dot_body(tree))
+
+    # Add watermark if enabled
+    _add_watermark(dot, watermark_text)
+
+    return dot
+
+def iter_mind_map_dot(tree: OutlineTree, topic: str, watermark_text: str = "", graph_layout: str = "Auto",
+    cluster_palette: str = None, **style
+):
+    """
+    Streams the same DOT source as build_mind_map_digraph(...).source line by
+    line, without materializing the body, for writing large maps to a file or
+    straight into a Graphviz process through _run_graphviz.
+    """
+    dot = _styled_digraph(tree, topic, graph_layout, **style)
+    *head, tail = dot
+    yield from head
+    yield from iter_clustered_dot_body(tree, cluster_palette) if cluster_palette and len(tree) else iter_dot_body(tree)
+    statements = len(dot.body)
+    _add_watermark(dot, watermark_text)
+    yield from dot.body[statements:]
+    yield tail
+
+# --- Native Tree Layout ---
+
+class TreeLayout:
+    """Positioned node boxes for an OutlineTree: centers and sizes in points, as NumPy arrays."""
+    __slots__ = ("x", "y", "width", "height", "depth", "parents", "rankdir", "size")
+
+    def __init__(self, x, y, width, height, depth, parents, rankdir, size):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.depth = depth
+        self.parents = parents
+        self.rankdir = rankdir
+        self.size = size
+
+    def __len__(self):
+        return len(self.x)
+
+def tree_depths(parents: np.ndarray) -> np.ndarray:
+    """Edge distance of every node from its root; one vectorized pass per tree level, so O(n * depth)."""
+    has_parent = parents >= 0
+    safe_parents = np.where(has_parent, parents, 0)
+    depth = np.zeros(len(parents), dtype=np.int32)
+    while True:
+        updated = np.where(has_parent, depth[safe_parents] + 1, 0).astype(np.int32)
+        if np.array_equal(updated, depth):
+            return depth
+        depth = updated
+
+def branch_clusters(parents: np.ndarray) -> np.ndarray:
+    """
+    Top-level branch of every node, numbered in outline order. With a single
+    root its children start the branches and the root itself gets -1;
+    with several roots each root starts one.
+    """
+    depth = tree_depths(parents)
+    roots = np.flatnonzero(parents < 0)
+    top_level = 0 if len(roots) > 1 else 1
+    clusters = np.full(len(parents), -1, dtype=np.int32)
+    tops = np.flatnonzero(depth == top_level)
+    clusters[tops] = np.arange(len(tops), dtype=np.int32)
+    for level in range(top_level + 1, int(depth.max(initial=0)) + 1):
+        nodes = np.flatnonzero(depth == level)
+        clusters[nodes] = clusters[parents[nodes]]
+    return clusters
+
+def estimate_node_sizes(tree: OutlineTree, font_size: int = 12, node_shape: str = "box"):
+    """Approximates node box width and height in points from label length and shape."""
+    label_lengths = np.diff(np.frombuffer(tree.label_offsets, dtype=np.uint32)).astype(np.float64)
+    width = np.maximum(label_lengths, 1.0) * font_size * TREE_CHAR_WIDTH + font_size * 1.5
+    height = np.full(len(width), font_size * 2.0)
+    if node_shape in ("ellipse", "hexagon"):
+        width, height = width * 1.3, height * 1.3
+    elif node_shape == "diamond":
+        width, height = width * 1.6, height * 1.6
+    elif node_shape == "circle":
+        width = height = np.maximum(width, height)
+    return width, height
+
+def _grouped_exclusive_cumsum(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """Exclusive running sum of values within each group, in original order."""
+    order = np.argsort(groups, kind="stable")
+    sorted_values = values[order]
+    running = np.cumsum(sorted_values) - sorted_values
+    sorted_groups = groups[order]
+    group_starts = np.r_[0, np.flatnonzero(sorted_groups[1:] != sorted_groups[:-1]) + 1]
+    group_lengths = np.diff(np.r_[group_starts, len(order)])
+    running -= np.repeat(running[group_starts], group_lengths)
+    result = np.empty_like(values)
+    result[order] = running
+    return result
+
+def _tidy_bands(parents: np.ndarray, depth: np.ndarray, sibling_extent: np.ndarray, sibling_gap: float,
+    pack_roots: bool = True
+):
+    """
+    Sibling-axis pass of tidy_tree_layout: returns (start, band) per node.
+    Roots are packed side by side, or with pack_roots=False all start at 0
+    so every tree of the forest is laid out as if it stood alone.
+    """
+    n = len(parents)
+    height_of_tree = int(depth.max())
+    levels = [np.flatnonzero(depth == level) for level in range(height_of_tree + 1)]
+    has_parent = parents >= 0
+
+    # Bottom-up: band needed by each subtree along the sibling axis
+    band = sibling_extent + sibling_gap
+    children_band = np.zeros(n)
+    for level in range(height_of_tree, 0, -1):
+        nodes = levels[level]
+        np.add.at(children_band, parents[nodes], band[nodes])
+        above = levels[level - 1]
+        band[above] = np.maximum(band[above], children_band[above])
+
+    # Top-down: place each band inside its parent's, children centered as a block
+    offset_in_parent = _grouped_exclusive_cumsum(band, np.where(has_parent, parents, -1))
+    start = np.zeros(n)
+    roots = levels[0]
+    if pack_roots:
+        start[roots] = np.cumsum(band[roots]) - band[roots]
+    padding = (band - children_band) / 2.0
+    for level in range(1, height_of_tree + 1):
+        nodes = levels[level]
+        node_parents = parents[nodes]
+        start[nodes] = start[node_parents] + padding[node_parents] + offset_in_parent[nodes]
+    return start, band
+
+def _place_tidy_ranks(sibling_pos: np.ndarray, total_sibling: float, depth: np.ndarray, parents: np.ndarray,
+    width: np.ndarray, height: np.ndarray, rankdir: str, rank_gap: float = TREE_RANK_GAP
+) -> TreeLayout:
+    """Finishes a tidy layout: one column (or row) per depth, as wide as its widest node."""
+    horizontal = rankdir in ("LR", "RL")
+    rank_extent = width if horizontal else height
+    rank_size = np.zeros(int(depth.max()) + 1)
+    np.maximum.at(rank_size, depth, rank_extent)
+    rank_start = np.cumsum(rank_size + rank_gap) - (rank_size + rank_gap)
+    rank_pos = rank_start[depth] + rank_size[depth] / 2.0 + TREE_MARGIN
+
+    total_rank = rank_start[-1] + rank_size[-1] + 2 * TREE_MARGIN
+    if rankdir in ("RL", "BT"):
+        rank_pos = total_rank - rank_pos
+    if horizontal:
+        return TreeLayout(rank_pos, sibling_pos, width, height, depth, parents, rankdir, (total_rank, total_sibling))
+    return TreeLayout(sibling_pos, rank_pos, width, height, depth, parents, rankdir, (total_sibling, total_rank))
+
+def tidy_tree_layout(tree: OutlineTree, orientation: str = "Left-Right (LR)", font_size: int = 12,
+    node_shape: str = "box", rank_gap: float = TREE_RANK_GAP, sibling_gap: float = TREE_SIBLING_GAP
+) -> TreeLayout:
+    """
+    Lays out an outline tree with NumPy.
+    Nodes sit on one rank per depth; every subtree gets a band along the
+    sibling axis wide enough for its children (or itself, if wider), siblings
+    are packed in outline order and parents are centered over their children.
+    Each step is a vectorized pass per tree level, so cost is O(n * depth);
+    outlines are shallow (max_depth caps them), so in practice this is a
+    handful of array passes.
+    """
+    rankdir = ORIENTATION_MAP.get(orientation, "LR")
+    n = len(tree)
+    parents = np.frombuffer(tree.parents, dtype=np.int32)
+    width, height = estimate_node_sizes(tree, font_size, node_shape)
+    if n == 0:
+        return TreeLayout(width, height, width, height, parents, parents, rankdir, (0.0, 0.0))
+    sibling_extent = height if rankdir in ("LR", "RL") else width
+    depth = tree_depths(parents)
+    start, band = _tidy_bands(parents, depth, sibling_extent, sibling_gap)
+    sibling_pos = start + band / 2.0 + TREE_MARGIN - sibling_gap / 2.0
+    roots = np.flatnonzero(parents < 0)
+    total_sibling = band[roots].sum() - sibling_gap + 2 * TREE_MARGIN
+    return _place_tidy_ranks(sibling_pos, total_sibling, depth, parents, width, height, rankdir, rank_gap)
+
+def branch_spans(parents: np.ndarray):
+    """
+    Index ranges of the subtrees a tidy layout packs side by side: the roots,
+    or the children of a single root at index 0. Returns (starts, stops), or
+    None unless each subtree is stored contiguously, as in outline order.
+    """
+    n = len(parents)
+    if n == 0:
+        return None
+    clusters = branch_clusters(parents)
+    first = 1 if clusters[0] < 0 else 0
+    steps = np.diff(clusters[first:])
+    if n == first or clusters[first] != 0 or np.any(clusters[first:] < 0) or np.any((steps < 0) | (steps > 1)):
+        return None
+    starts = first + np.r_[0, np.flatnonzero(steps) + 1]
+    return starts, np.r_[starts[1:], n]
+
+def tidy_branch_layouts(parents: np.ndarray, starts: np.ndarray, stops: np.ndarray, selected: np.ndarray,
+    sibling_extent: np.ndarray, sibling_gap: float = TREE_SIBLING_GAP
+):
+    """
+    Lays out the selected branches (a mask over starts/stops) in one
+    vectorized pass, each as if it stood alone. Returns (nodes, position,
+    depth, band): the node indices covered, their sibling-axis centers within
+    their branch's band and depths below its root, and each selected band.
+    """
+    branch = np.repeat(np.arange(len(starts)), stops - starts)
+    nodes = starts[0] + np.flatnonzero(selected[branch])
+    remap = np.full(len(parents), -1, dtype=np.int32)
+    remap[nodes] = np.arange(len(nodes), dtype=np.int32)
+    node_parents = parents[nodes]
+    forest = np.where(node_parents >= starts[branch[nodes - starts[0]]], remap[node_parents], -1)
+    depth = tree_depths(forest)
+    start, band = _tidy_bands(forest, depth, sibling_extent[nodes], sibling_gap, pack_roots=False)
+    return nodes, start + band / 2.0 - sibling_gap / 2.0, depth, band[remap[starts[selected]]]
+
+def compose_tidy_layout(parents: np.ndarray, width: np.ndarray, height: np.ndarray, rankdir: str,
+    starts: np.ndarray, stops: np.ndarray, position: np.ndarray, depth: np.ndarray, bands: np.ndarray,
+    rank_gap: float = TREE_RANK_GAP, sibling_gap: float = TREE_SIBLING_GAP
+) -> TreeLayout:
+    """
+    Packs branches laid out by tidy_branch_layouts the way tidy_tree_layout
+    packs subtrees: side by side in outline order, with a single root
+    centered over them. position and depth cover the nodes from starts[0] on.
+    """
+    head = int(starts[0])
+    branch_start = np.cumsum(bands) - bands
+    total_band = bands.sum()
+    if head:
+        root_extent = height[0] if rankdir in ("LR", "RL") else width[0]
+        root_band = max(root_extent + sibling_gap, total_band)
+        branch_start += (root_band - total_band) / 2.0
+        total_band = root_band
+    sibling_pos = np.empty(len(parents))
+    sibling_pos[:head] = total_band / 2.0 - sibling_gap / 2.0
+    sibling_pos[head:] = position + np.repeat(branch_start, stops - starts)
+    sibling_pos += TREE_MARGIN
+    depth = np.r_[np.zeros(head, dtype=np.int32), depth + head]
+    total_sibling = total_band - sibling_gap + 2 * TREE_MARGIN
+    return _place_tidy_ranks(sibling_pos, total_sibling, depth, parents, width, height, rankdir, rank_gap)
+
+def radial_tree_layout(tree: OutlineTree, font_size: int = 12, node_shape: str = "box",
+    ring_gap: float = TREE_RANK_GAP, sibling_gap: float = TREE_SIBLING_GAP
+) -> TreeLayout:
+    """
+    Radial layout: depth sets the ring, and each subtree gets an angular wedge
+    proportional to its leaf count, with children splitting their parent's
+    wedge in outline order. Vectorized per tree level like tidy_tree_layout.
+    """
+    n = len(tree)
+    parents = np.frombuffer(tree.parents, dtype=np.int32)
+    width, height = estimate_node_sizes(tree, font_size, node_shape)
+    if n == 0:
+        return TreeLayout(width, height, width, height, parents, parents, "RADIAL", (0.0, 0.0))
+    depth = tree_depths(parents)
+    height_of_tree = int(depth.max())
+    levels = [np.flatnonzero(depth == level) for level in range(height_of_tree + 1)]
+    has_parent = parents >= 0
+
+    leaves = np.zeros(n)
+    child_count = np.bincount(parents[has_parent], minlength=n)
+    leaves[child_count == 0] = 1.0
+    for level in range(height_of_tree, 0, -1):
+        nodes = levels[level]
+        np.add.at(leaves, parents[nodes], leaves[nodes])
+
+    roots = levels[0]
+    wedge = 2 * np.pi * leaves / leaves[roots].sum()
+    start = np.zeros(n)
+    start[roots] = np.cumsum(wedge[roots]) - wedge[roots]
+    offset_in_parent = _grouped_exclusive_cumsum(wedge, np.where(has_parent, parents, -1))
+    for level in range(1, height_of_tree + 1):
+        nodes = levels[level]
+        start[nodes] = start[parents[nodes]] + offset_in_parent[nodes]
+    angle = start + wedge / 2.0
+
+    # Several roots share a ring around an empty center instead of stacking on it
+    ring = depth + (1 if len(roots) > 1 else 0)
+    ring_count = int(ring.max()) + 1
+    extent = np.hypot(width, height)
+    ring_extent = np.zeros(ring_count)
+    np.maximum.at(ring_extent, ring, extent)
+    # Radius must clear the previous ring and leave each wedge room for its node's tangential extent
+    tangential = width * np.abs(np.sin(angle)) + height * np.abs(np.cos(angle))
+    needed = (tangential + sibling_gap) / np.maximum(wedge, 1e-9)
+    ring_needed = np.zeros(ring_count)
+    np.maximum.at(ring_needed, ring, needed)
+    radius = np.zeros(ring_count)
+    for r in range(1, ring_count):
+        radius[r] = max(radius[r - 1] + (ring_extent[r - 1] + ring_extent[r]) / 2 + ring_gap, ring_needed[r])
+    if len(roots) == 1:
+        angle[roots] = 0.0
+    node_radius = radius[ring]
+    x = node_radius * np.cos(angle)
+    y = node_radius * np.sin(angle)
+    x -= (x - width / 2).min() - TREE_MARGIN
+    y -= (y - height / 2).min() - TREE_MARGIN
+    size = ((x + width / 2).max() + TREE_MARGIN, (y + height / 2).max() + TREE_MARGIN)
+    return TreeLayout(x, y, width, height, depth, parents, "RADIAL", size)
+
+def _edge_dasharray(edge_style: str) -> str:
+    return {"dashed": "5,5", "dotted": "1,4"}.get(edge_style, "none")
+
+def _tree_svg_style(font_size: int = 12, node_color: str = "#ADD8E6", node_border_color: str = "#000000",
+    node_border_width: int = 2, node_border_opacity: float = 1.0, edge_color: str = "#888888", edge_style: str = "solid",
+    edge_opacity: float = 1.0, node_font: str = "Helvetica", node_font_color: str = "#000000", bg_color: str = "#FFFFFF",
+    cluster_palette: str = None, reveal_step: float = None, **_
+) -> str:
+    """
+    CSS for the native SVG renderer; all colors live here rather than on the
+    elements. With reveal_step, elements drawn with reveal_order fade in one
+    after another, reveal_step seconds apart.
+    """
+    edge_width = 2.0 if edge_style == "bold" else 1.0
+    cluster_rules = "".join(
+        f".cluster.c{index} {{ fill: {color}; fill-opacity: 0.35; }}\n.c{index} > .node {{ fill: {color}; }}\n"
+        for index, color in enumerate(GROUP_COLOR_PALETTES.get(cluster_palette, ()))
+    )
+    reveal_rules = (
+        "@keyframes reveal { from { opacity: 0; } to { opacity: 1; } }\n"
+        f".edges > path, .nodes > g {{ animation: reveal 0.4s ease-out both; animation-delay: calc(var(--i) * {reveal_step:.4f}s); }}\n"
+        if reveal_step else ""
+    )
+    return (
+        f".background {{ fill: {bg_color}; }}\n"
+        f".node {{ fill: {node_color}; stroke: {node_border_color}; stroke-width: {node_border_width}; "
+        f"stroke-opacity: {node_border_opacity}; }}\n"
+        f".edge {{ fill: none; stroke: {edge_color}; stroke-width: {edge_width}; stroke-dasharray: {_edge_dasharray(edge_style)}; "
+        f"stroke-opacity: {edge_opacity}; }}\n"
+        f".arrow {{ fill: {edge_color}; fill-opacity: {edge_opacity}; stroke: none; }}\n"
+        f".label {{ fill: {node_font_color}; font-family: {node_font}, sans-serif; font-size: {font_size}px; "
+        f"text-anchor: middle; dominant-baseline: central; }}\n"
+        ".watermark { fill: #CCCCCC; font-size: 10px; text-anchor: end; }\n"
+        f".added > .node {{ stroke: {DIFF_ADDED_COLOR}; stroke-width: {node_border_width + 2}; stroke-opacity: 1; }}\n"
+        f"{cluster_rules}{reveal_rules}"
+    )
+
+def apply_theme(style: dict, theme: str = "Light", colorblind_mode: bool = False) -> dict:
+    """Returns the style options with the theme preset and colorblind palette applied."""
+    style = {**style, **THEME_PRESETS.get(theme, {})}
+    if colorblind_mode:
+        style.update(COLORBLIND_COLORS)
+    return style
+
+def reveal_step(node_count: int, speed: float = 1.0) -> float:
+    """Seconds between node reveals for the generation animation at the given speed."""
+    return min(ANIMATION_NODE_INTERVAL / speed, ANIMATION_MAX_SECONDS / max(node_count, 1))
+
+def restyle_svg(svg: str, **style) -> str:
+    """
+    Repaints an SVG from iter_tree_svg by swapping its <style> block. The
+    block sits at the top of the document, so this costs one string copy
+    no matter how large the map is.
+    """
+    start = svg.index("<style>") + len("<style>\n")
+    end = svg.index("</style>", start)
+    return svg[:start] + _tree_svg_style(**style) + svg[end:]
+
+def _node_shape_svg(shape: str, x: float, y: float, w: float, h: float) -> str:
+    if shape in ("ellipse", "circle"):
+        return f'<ellipse class="node" cx="{x:.1f}" cy="{y:.1f}" rx="{w / 2:.1f}" ry="{h / 2:.1f}"/>'
+    if shape == "diamond":
+        return (f'<polygon class="node" points="{x:.1f},{y - h / 2:.1f} {x + w / 2:.1f},{y:.1f} '
+                f'{x:.1f},{y + h / 2:.1f} {x - w / 2:.1f},{y:.1f}"/>')
+    if shape == "hexagon":
+        q = w / 4
+        return (f'<polygon class="node" points="{x - w / 2:.1f},{y:.1f} {x - q:.1f},{y - h / 2:.1f} '
+                f'{x + q:.1f},{y - h / 2:.1f} {x + w / 2:.1f},{y:.1f} {x + q:.1f},{y + h / 2:.1f} {x - q:.1f},{y + h / 2:.1f}"/>')
+    return (f'<rect class="node" x="{x - w / 2:.1f}" y="{y - h / 2:.1f}" width="{w:.1f}" height="{h:.1f}" '
+            f'rx="{min(h, w) / 4:.1f}"/>')
+
+class EdgeRoutes:
+    """
+    Routed connectors for a TreeLayout as polylines in drawing coordinates.
+    points[i] (shape E x K x 2) runs from the parent side to node children[i];
+    trunks are shared bus segments drawn without arrowheads, and
+    trunk_parents[j] is the node whose children trunks[j] connects.
+    """
+    __slots__ = ("children", "points", "trunks", "trunk_parents")
+
+    def __init__(self, children, points, trunks, trunk_parents=None):
+        self.children = children
+        self.points = points
+        self.trunks = trunks
+        self.trunk_parents = np.zeros(len(trunks), dtype=np.int32) if trunk_parents is None else trunk_parents
+
+def _rank_coordinates(layout: TreeLayout):
+    """Returns (rank, sibling, rank_extent, sign) with rank increasing away from the root."""
+    sign = 1.0 if layout.rankdir in ("LR", "TB") else -1.0
+    if layout.rankdir in ("LR", "RL"):
+        return sign * layout.x, layout.y, layout.width, sign
+    return sign * layout.y, layout.x, layout.height, sign
+
+def _to_drawing(layout: TreeLayout, rank, sibling, sign):
+    """Stacks rank/sibling coordinates back into (..., 2) x/y points."""
+    if layout.rankdir in ("LR", "RL"):
+        return np.stack([sign * rank, sibling], axis=-1)
+    return np.stack([sibling, sign * rank], axis=-1)
+
+def route_tree_edges(layout: TreeLayout, routing: str = "elbow") -> EdgeRoutes:
+    """
+    Computes connectors analytically from node positions, so no Graphviz
+    routing is needed. "elbow" gives each edge an orthogonal three-segment
+    connector turning halfway between ranks; "bus" shares one trunk per
+    parent with a short stub to each child; "straight" joins facing sides.
+    Radial layouts always use straight connectors clipped to the node boxes.
+    """
+    children = np.flatnonzero(layout.parents >= 0)
+    parents = layout.parents[children]
+    empty_trunks = np.zeros((0, 2, 2))
+    if layout.rankdir == "RADIAL":
+        dx = layout.x[children] - layout.x[parents]
+        dy = layout.y[children] - layout.y[parents]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_parent = np.minimum(layout.width[parents] / 2 / np.abs(dx), layout.height[parents] / 2 / np.abs(dy))
+            t_child = np.minimum(layout.width[children] / 2 / np.abs(dx), layout.height[children] / 2 / np.abs(dy))
+        t_parent = np.nan_to_num(t_parent, posinf=0.0)
+        t_child = np.nan_to_num(t_child, posinf=0.0)
+        start = np.stack([layout.x[parents] + dx * t_parent, layout.y[parents] + dy * t_parent], axis=-1)
+        end = np.stack([layout.x[children] - dx * t_child, layout.y[children] - dy * t_child], axis=-1)
+        return EdgeRoutes(children, np.stack([start, end], axis=1), empty_trunks)
+
+    rank, sibling, extent, sign = _rank_coordinates(layout)
+    far_side = rank + extent / 2
+    near_side = rank - extent / 2
+    if routing == "straight":
+        points = np.stack([
+            _to_drawing(layout, far_side[parents], sibling[parents], sign),
+            _to_drawing(layout, near_side[children], sibling[children], sign),
+        ], axis=1)
+        return EdgeRoutes(children, points, empty_trunks)
+
+    # Turn halfway through the gap between a rank's widest node and the next rank
+    levels = int(layout.depth.max()) + 1 if len(layout) else 1
+    column_far = np.full(levels, -np.inf)
+    column_near = np.full(levels, np.inf)
+    np.maximum.at(column_far, layout.depth, far_side)
+    np.minimum.at(column_near, layout.depth, near_side)
+    bus_by_depth = (column_far[:-1] + column_near[1:]) / 2
+    bus = bus_by_depth[layout.depth[parents]] if len(children) else np.zeros(0)
+
+    if routing == "bus":
+        points = np.stack([
+            _to_drawing(layout, bus, sibling[children], sign),
+            _to_drawing(layout, near_side[children], sibling[children], sign),
+        ], axis=1)
+        trunk_parents = np.unique(parents)
+        span_low = sibling.copy()
+        span_high = sibling.copy()
+        np.minimum.at(span_low, parents, sibling[children])
+        np.maximum.at(span_high, parents, sibling[children])
+        trunk_bus = bus_by_depth[layout.depth[trunk_parents]]
+        stems = np.stack([
+            _to_drawing(layout, far_side[trunk_parents], sibling[trunk_parents], sign),
+            _to_drawing(layout, trunk_bus, sibling[trunk_parents], sign),
+        ], axis=1)
+        spans = np.stack([
+            _to_drawing(layout, trunk_bus, span_low[trunk_parents], sign),
+            _to_drawing(layout, trunk_bus, span_high[trunk_parents], sign),
+        ], axis=1)
+        return EdgeRoutes(
+            children, points, np.concatenate([stems, spans]), np.concatenate([trunk_parents, trunk_parents]).astype(np.int32)
+        )
+
+    points = np.stack([
+        _to_drawing(layout, far_side[parents], sibling[parents], sign),
+        _to_drawing(layout, bus, sibling[parents], sign),
+        _to_drawing(layout, bus, sibling[children], sign),
+        _to_drawing(layout, near_side[children], sibling[children], sign),
+    ], axis=1)
+    return EdgeRoutes(children, points, empty_trunks)
+
+def mirror_tree_layout(layout: TreeLayout, routes: EdgeRoutes, axis: int, rankdir: str):
+    """
+    Reflects a layout and its routes across the middle of one drawing axis,
+    turning LR into RL or TB into BT without laying out again. Rotations
+    (LR into TB) cannot be derived this way because node boxes keep their
+    horizontal text and so swap their rank and sibling extents.
+    """
+    extent = layout.size[axis]
+    coordinates = [layout.x, layout.y]
+    coordinates[axis] = extent - coordinates[axis]
+    points = routes.points.copy()
+    points[..., axis] = extent - points[..., axis]
+    trunks = routes.trunks.copy()
+    trunks[..., axis] = extent - trunks[..., axis]
+    mirrored = TreeLayout(*coordinates, layout.width, layout.height, layout.depth, layout.parents, rankdir, layout.size)
+    return mirrored, EdgeRoutes(routes.children, points, trunks, routes.trunk_parents)
+
+def _polyline_paths(points: np.ndarray):
+    """Yields SVG path data for each polyline in an (N, K, 2) array."""
+    for polyline in points.tolist():
+        (x0, y0), *rest = polyline
+        yield f"M{x0:.1f},{y0:.1f}" + "".join(f"L{x:.1f},{y:.1f}" for x, y in rest)
+
+# Elements per chunk yielded by iter_tree_svg
+SVG_CHUNK_ELEMENTS = 2048
+
+def iter_tree_svg(tree: OutlineTree, layout: TreeLayout, topic: str, node_shape: str = "box",
+    edge_arrow_size: float = 1.0, watermark_text: str = "", edge_routing: str = "elbow", routes: EdgeRoutes = None,
+    enable_clustering: bool = False, reveal_order: bool = False, added: np.ndarray = None, **style
+):
+    """
+    Streams a TreeLayout as an SVG document in chunks of SVG_CHUNK_ELEMENTS
+    elements. Styling lives in one <style> block, so each element only
+    carries its geometry and a shared class name. With clustering, each
+    top-level branch gets a background box (except in radial layouts, where
+    branch boxes would overlap) and its nodes a cN class for the palette.
+    With reveal_order, every node and edge carries its generation order as
+    --i, so a reveal_step style plays the map back without another layout.
+    Nodes set in the added mask get the "added" class.
+    """
+    total_width, total_height = layout.size
+    arrow = 7.0 * edge_arrow_size
+    yield (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{total_width:.0f}pt" height="{total_height:.0f}pt" '
+        f'viewBox="0 0 {total_width:.1f} {total_height:.1f}">\n'
+        f"<title>{html.escape(f'Mind Map for {topic}')}</title>\n"
+        f"<style>\n{_tree_svg_style(**style)}</style>\n"
+        f'<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerUnits="userSpaceOnUse" '
+        f'markerWidth="{arrow:.1f}" markerHeight="{arrow:.1f}" orient="auto">'
+        f'<path class="arrow" d="M0,0L10,5L0,10z"/></marker></defs>\n'
+        '<rect class="background" width="100%" height="100%"/>\n'
+    )
+    palette_size = len(GROUP_COLOR_PALETTES["Default"])
+    clusters = branch_clusters(layout.parents) if enable_clustering and len(layout) else None
+    if clusters is not None and layout.rankdir != "RADIAL" and clusters.max() >= 0:
+        members = clusters >= 0
+        count = int(clusters.max()) + 1
+        pad = TREE_SIBLING_GAP / 2 - 1
+        low_x, low_y = np.full(count, np.inf), np.full(count, np.inf)
+        high_x, high_y = np.full(count, -np.inf), np.full(count, -np.inf)
+        np.minimum.at(low_x, clusters[members], (layout.x - layout.width / 2)[members])
+        np.minimum.at(low_y, clusters[members], (layout.y - layout.height / 2)[members])
+        np.maximum.at(high_x, clusters[members], (layout.x + layout.width / 2)[members])
+        np.maximum.at(high_y, clusters[members], (layout.y + layout.height / 2)[members])
+        yield '<g class="clusters">\n' + "".join(
+            f'<rect class="cluster c{cluster % palette_size}" x="{x0 - pad:.1f}" y="{y0 - pad:.1f}" '
+            f'width="{x1 - x0 + 2 * pad:.1f}" height="{y1 - y0 + 2 * pad:.1f}" rx="{pad:.1f}"/>\n'
+            for cluster, (x0, y0, x1, y1) in enumerate(zip(low_x.tolist(), low_y.tolist(), high_x.tolist(), high_y.tolist()))
+        ) + "</g>\n"
+    yield '<g class="edges">\n'
+    if routes is None:
+        routes = route_tree_edges(layout, edge_routing)
+    # Edges appear with their child; a shared bus trunk with its parent's first child
+    first_child = np.full(len(layout), len(layout), dtype=np.int64)
+    np.minimum.at(first_child, layout.parents[routes.children], routes.children)
+    orders = ((first_child[routes.trunk_parents], ""), (routes.children, ' marker-end="url(#arrow)"'))
+    # Work through the arrays in slices so only one chunk of Python objects is alive at a time
+    for (order, marker), polylines in zip(orders, (routes.trunks, routes.points)):
+        for start in range(0, len(polylines), SVG_CHUNK_ELEMENTS):
+            stop = start + SVG_CHUNK_ELEMENTS
+            reveal = (f' style="--i:{index}"' for index in order[start:stop].tolist()) if reveal_order else repeat("")
+            yield "".join(
+                f'<path class="edge" d="{path}"{marker}{attr}/>\n'
+                for path, attr in zip(_polyline_paths(polylines[start:stop]), reveal)
+            )
+    chunk = ['</g><g class="nodes">\n']
+    escape = html.escape
+    for start in range(0, len(layout), SVG_CHUNK_ELEMENTS):
+        stop = start + SVG_CHUNK_ELEMENTS
+        boxes = zip(layout.x[start:stop].tolist(), layout.y[start:stop].tolist(),
+                    layout.width[start:stop].tolist(), layout.height[start:stop].tolist())
+        for index, (x, y, w, h) in enumerate(boxes, start):
+            classes = []
+            if clusters is not None and clusters[index] >= 0:
+                classes.append(f"c{clusters[index] % palette_size}")
+            if added is not None and added[index]:
+                classes.append("added")
+            group_class = f' class="{" ".join(classes)}"' if classes else ""
+            if reveal_order:
+                group_class += f' style="--i:{index}"'
+            chunk.append(
+                f'<g id="{escape(tree.node_id(index), quote=True)}"{group_class}>{_node_shape_svg(node_shape, x, y, w, h)}'
+                f'<text class="label" x="{x:.1f}" y="{y:.1f}">{escape(tree.label(index))}</text></g>\n'
+            )
+        yield "".join(chunk)
+        chunk.clear()
+    chunk.append("</g>\n")
+    if watermark_text:
+        chunk.append(
+            f'<text class="watermark" x="{total_width - TREE_MARGIN:.1f}" y="{total_height - 2:.1f}">'
+            f'{escape(watermark_text)}</text>\n'
+        )
+    chunk.append("</svg>\n")
+    yield "".join(chunk)
+
+def render_tree_svg(tree: OutlineTree, layout: TreeLayout, topic: str, **options) -> str:
+    """Draws a TreeLayout as one SVG string (for st.image); stream iter_tree_svg to write it elsewhere."""
+    return "".join(iter_tree_svg(tree, layout, topic, **options))
 
-def generate_mind_map(topic: str):
-    """Calls the Gemini API to generate the mind map markdown."""
-    model = genai.GenerativeModel('gemini-2.5-flash')
+def minimap_viewport(size, zoom: float = 1.0, center_x: float = 0.5, center_y: float = 0.5):
+    """Returns the (x, y, width, height) window of a drawing of the given size, kept inside the drawing."""
+    total_width, total_height = size
+    width, height = total_width / zoom, total_height / zoom
+    x = min(max(center_x * total_width - width / 2, 0.0), total_width - width)
+    y = min(max(center_y * total_height - height / 2, 0.0), total_height - height)
+    return x, y, width, height
+
+def crop_svg(svg: str, viewport) -> str:
+    """Points the root viewBox of an iter_tree_svg document at viewport without redrawing it."""
+    x, y, width, height = viewport
+    header_end = svg.index(">") + 1
+    header = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}pt" height="{height:.0f}pt" '
+        f'viewBox="{x:.1f} {y:.1f} {width:.1f} {height:.1f}">'
+    )
+    return header + svg[header_end:]
+
+def minimap_svg(layout: TreeLayout, viewport=None, node_color: str = "#ADD8E6", edge_color: str = "#888888",
+    bg_color: str = "#FFFFFF", **_
+) -> str:
+    """
+    Downsampled overview of a TreeLayout. Node boxes are rasterized onto a
+    grid of MINIMAP_CELL pixel cells with a summed-area pass and emitted as
+    one rectangle per horizontal run; only edges above MINIMAP_EDGE_DEPTH are
+    drawn. Cost is O(n + cells), so large maps take milliseconds.
+    """
+    total_width, total_height = layout.size
+    scale = MINIMAP_SIZE / max(total_width, total_height, 1.0)
+    cols = max(int(np.ceil(total_width * scale / MINIMAP_CELL)), 1)
+    rows = max(int(np.ceil(total_height * scale / MINIMAP_CELL)), 1)
+    cell = MINIMAP_CELL / scale
+
+    # Mark each box's corner cells in a difference grid, then integrate to get coverage
+    x0 = np.clip(((layout.x - layout.width / 2) / cell).astype(np.int64), 0, cols - 1)
+    x1 = np.clip(((layout.x + layout.width / 2) / cell).astype(np.int64), 0, cols - 1) + 1
+    y0 = np.clip(((layout.y - layout.height / 2) / cell).astype(np.int64), 0, rows - 1)
+    y1 = np.clip(((layout.y + layout.height / 2) / cell).astype(np.int64), 0, rows - 1) + 1
+    grid = np.zeros((rows + 1, cols + 1), dtype=np.int32)
+    np.add.at(grid, (y0, x0), 1)
+    np.add.at(grid, (y0, x1), -1)
+    np.add.at(grid, (y1, x0), -1)
+    np.add.at(grid, (y1, x1), 1)
+    covered = grid.cumsum(axis=0).cumsum(axis=1)[:rows, :cols] > 0
+
+    # Horizontal runs of covered cells: +1 where a run starts, -1 just past where it ends
+    edges_of_runs = np.diff(np.pad(covered.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    run_rows, run_starts = np.nonzero(edges_of_runs == 1)
+    run_ends = np.nonzero(edges_of_runs == -1)[1]
+    side = MINIMAP_CELL
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{cols * side}" height="{rows * side}" '
+        f'viewBox="0 0 {cols * side} {rows * side}">',
+        f'<rect width="100%" height="100%" fill="{bg_color}" stroke="#888888"/>',
+        f'<g fill="{node_color}">',
+    ]
+    parts.extend(
+        f'<rect x="{start * side}" y="{row * side}" width="{(end - start) * side}" height="{side}"/>'
+        for row, start, end in zip(run_rows.tolist(), run_starts.tolist(), run_ends.tolist())
+    )
+    parts.append(f'</g><g stroke="{edge_color}" stroke-width="1">')
+    children = np.flatnonzero((layout.parents >= 0) & (layout.depth <= MINIMAP_EDGE_DEPTH))
+    parents = layout.parents[children]
+    lines = np.stack([layout.x[parents], layout.y[parents], layout.x[children], layout.y[children]], axis=1) * scale
+    # Edges that land on the same pixels are drawn once
+    lines = np.unique(np.rint(lines).astype(np.int32), axis=0)
+    parts.extend(f'<line x1="{a}" y1="{b}" x2="{c}" y2="{d}"/>' for a, b, c, d in lines.tolist())
+    parts.append("</g>")
+    if viewport is not None:
+        x, y, width, height = (value * scale for value in viewport)
+        parts.append(
+            f'<rect x="{x:.1f}" y="{y:.1f}" width="{width:.1f}" height="{height:.1f}" '
+            'fill="none" stroke="#E4572E" stroke-width="2"/>'
+        )
+    parts.append("</svg>")
+    return "".join(parts)
+
+def high_res_scale(size, dpi: int = HIGH_RES_DEFAULT_DPI, max_pixels: int = HIGH_RES_DEFAULT_MAX_MEGAPIXELS * 10**6) -> float:
+    """Pixels per layout point for a PNG at dpi, reduced so the image stays within max_pixels."""
+    total_width, total_height = size
+    scale = dpi / 72.0
+    area = max(total_width * total_height, 1.0)
+    return min(scale, (max_pixels / area) ** 0.5)
+
+def _band_buckets(low: np.ndarray, high: np.ndarray, band_height: int, band_count: int):
+    """
+    Assigns items to every band their [low, high] extent overlaps. Returns
+    (items, bounds): band b draws items[bounds[b]:bounds[b + 1]].
+    """
+    first = np.clip(low // band_height, 0, band_count - 1).astype(np.int64)
+    last = np.clip(high // band_height, 0, band_count - 1).astype(np.int64)
+    spans = np.maximum(last - first + 1, 0)
+    items = np.repeat(np.arange(len(spans)), spans)
+    run_starts = np.repeat(np.cumsum(spans) - spans, spans)
+    bands = np.repeat(first, spans) + np.arange(len(items)) - run_starts
+    order = np.argsort(bands, kind="stable")
+    return items[order], np.searchsorted(bands[order], np.arange(band_count + 1))
+
+def _snap(values: np.ndarray) -> np.ndarray:
+    """Rounds pixel coordinates to a 1/256 pixel grid, on which integer shifts are exact."""
+    return np.round(values * 256) / 256
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+def iter_tree_png(tree: OutlineTree, layout: TreeLayout, routes: EdgeRoutes, scale: float, node_shape: str = "box",
+    font_size: int = 12, node_color: str = "#ADD8E6", node_border_color: str = "#000000", node_border_width: int = 2,
+    edge_color: str = "#888888", edge_style: str = "solid", edge_arrow_size: float = 1.0,
+    node_font_color: str = "#000000", bg_color: str = "#FFFFFF", watermark_text: str = "", **_
+):
+    """
+    Streams a TreeLayout as PNG bytes. The image is rasterized one band of
+    rows at a time with PIL, and each band is deflated into IDAT chunks as
+    soon as it is drawn, so peak memory is one band (HIGH_RES_BAND_PIXELS,
+    overscan rows included, or four times the overscan for very wide maps)
+    whatever the output size. The result matches a single-band render pixel
+    for pixel. Dash styles are drawn solid.
+    """
+    total_width, total_height = layout.size
+    width = max(int(np.ceil(total_width * scale)), 1)
+    height = max(int(np.ceil(total_height * scale)), 1)
+    font = ImageFont.load_default(size=max(font_size * scale, 1.0))
+    line_width = max(round((2.0 if edge_style == "bold" else 1.0) * scale), 1)
+    border_width = max(round(node_border_width * scale), 1)
+    # Geometry is snapped to a 1/256 pixel grid (strokes to whole pixels, which PIL's
+    # thin lines need), so shifting it by a band's integer offset is exact and each
+    # band rasterizes exactly what a single-band render would
+    x, y = _snap(layout.x * scale), _snap(layout.y * scale)
+    half_w, half_h = _snap(layout.width * scale / 2), _snap(layout.height * scale / 2)
+    arrow = 7.0 * edge_arrow_size * scale
+    if watermark_text:
+        watermark_font = ImageFont.load_default(size=10 * scale)
+        watermark_at = _snap(np.array([(total_width - TREE_MARGIN) * scale, height - 2 * scale])).tolist()
+        _, watermark_top, _, watermark_bottom = watermark_font.getbbox(watermark_text, anchor="rd")
+        watermark_rows = (watermark_at[1] + watermark_top - 1, watermark_at[1] + watermark_bottom + 1)
+    # PIL clips shapes that cross the canvas edge differently from whole ones, so every
+    # band is drawn with this many extra rows above and below (enough to hold any node,
+    # arrowhead, stroke end or watermark whole) and cropped. Vertical edge segments can
+    # be any length and are cut to the canvas first, which leaves their pixels unchanged.
+    overscan = int(np.ceil(max(
+        2 * float(half_h.max()) if len(layout) else 0.0, arrow,
+        watermark_rows[1] - watermark_rows[0] if watermark_text else 0.0
+    ))) + border_width + line_width + 2
+    # Bands stay at least twice the overscan high, so rows are never drawn more than twice
+    band_height = max(1, min(height, max(HIGH_RES_BAND_PIXELS // width - 2 * overscan, 2 * overscan)))
+    band_count = -(-height // band_height)
+    pixels_per_meter = round(scale * 72 / 0.0254)
+    yield b"\x89PNG\r\n\x1a\n"
+    yield _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+    yield _png_chunk(b"pHYs", struct.pack(">IIB", pixels_per_meter, pixels_per_meter, 1))
+
+    # Everything in pixels, bucketed by the band canvases (overscan included) its
+    # drawn extent touches, so items that cross a band boundary are drawn in each band
+    node_pad = border_width + 1 + overscan
+    node_items, node_bounds = _band_buckets(y - half_h - node_pad, y + half_h + node_pad, band_height, band_count)
+    segments = np.round(np.concatenate([
+        np.stack([routes.points[:, :-1], routes.points[:, 1:]], axis=2).reshape(-1, 2, 2),
+        routes.trunks,
+    ]) * scale)
+    segment_items, segment_bounds = _band_buckets(
+        segments[:, :, 1].min(axis=1) - overscan, segments[:, :, 1].max(axis=1) + overscan, band_height, band_count
+    )
+    # Arrowheads: triangles pointing along each edge's last segment
+    tip, tail = routes.points[:, -1] * scale, routes.points[:, -2] * scale
+    direction = tip - tail
+    direction /= np.maximum(np.hypot(direction[:, 0], direction[:, 1]), 1e-9)[:, None]
+    normal = np.stack([-direction[:, 1], direction[:, 0]], axis=1)
+    base = tip - direction * arrow
+    arrows = _snap(np.stack([tip, base + normal * arrow / 2, base - normal * arrow / 2], axis=1))
+    arrow_items, arrow_bounds = _band_buckets(
+        arrows[:, :, 1].min(axis=1) - overscan, arrows[:, :, 1].max(axis=1) + overscan, band_height, band_count
+    )
+    compressor = zlib.compressobj(6)
+    for band in range(band_count):
+        rows = min(band_height, height - band * band_height)
+        top = band * band_height - overscan
+        canvas_rows = rows + 2 * overscan
+        image = Image.new("RGB", (width, canvas_rows), bg_color)
+        draw = ImageDraw.Draw(image)
+        band_segments = segments[segment_items[segment_bounds[band]:segment_bounds[band + 1]]] - (0, top)
+        vertical = band_segments[:, 0, 0] == band_segments[:, 1, 0]
+        band_segments[vertical, :, 1] = np.clip(band_segments[vertical, :, 1], 0, canvas_rows)
+        for (x0, y0), (x1, y1) in band_segments.tolist():
+            draw.line([(x0, y0), (x1, y1)], fill=edge_color, width=line_width)
+        for triangle in arrows[arrow_items[arrow_bounds[band]:arrow_bounds[band + 1]]].tolist():
+            draw.polygon([(px, py - top) for px, py in triangle], fill=edge_color)
+        for index in node_items[node_bounds[band]:node_bounds[band + 1]].tolist():
+            cx, cy, w, h = x[index], y[index] - top, half_w[index], half_h[index]
+            box = [cx - w, cy - h, cx + w, cy + h]
+            if node_shape in ("ellipse", "circle"):
+                draw.ellipse(box, fill=node_color, outline=node_border_color, width=border_width)
+            elif node_shape == "diamond":
+                draw.polygon([(cx, cy - h), (cx + w, cy), (cx, cy + h), (cx - w, cy)],
+                             fill=node_color, outline=node_border_color, width=border_width)
+            elif node_shape == "hexagon":
+                q = w / 2
+                draw.polygon([(cx - w, cy), (cx - q, cy - h), (cx + q, cy - h), (cx + w, cy), (cx + q, cy + h), (cx - q, cy + h)],
+                             fill=node_color, outline=node_border_color, width=border_width)
+            else:
+                draw.rounded_rectangle(box, radius=min(w, h) / 2, fill=node_color, outline=node_border_color, width=border_width)
+            draw.text((cx, cy), tree.label(index), fill=node_font_color, font=font, anchor="mm")
+        if watermark_text and watermark_rows[0] < top + canvas_rows and watermark_rows[1] >= top:
+            draw.text((watermark_at[0], watermark_at[1] - top), watermark_text, fill="#CCCCCC",
+                      font=watermark_font, anchor="rd")
+        # Each PNG scanline starts with its filter type byte (0: none)
+        pixels = memoryview(image.crop((0, overscan, width, overscan + rows)).tobytes())
+        del draw, image
+        stride = width * 3
+        data = b"".join(
+            compressor.compress(b"\x00") + compressor.compress(pixels[row * stride:(row + 1) * stride])
+            for row in range(rows)
+        )
+        if data:
+            yield _png_chunk(b"IDAT", data)
+    yield _png_chunk(b"IDAT", compressor.flush())
+    yield _png_chunk(b"IEND", b"")
+
+def iter_tree_pdf(tree: OutlineTree, layout: TreeLayout, routes: EdgeRoutes, scale: float, **style):
+    """
+    Streams a TreeLayout as a one-page PDF the size of the layout in points.
+    The page is the iter_tree_png raster: its IDAT data is copied into the
+    image stream as is (PDF's Flate predictor 15 decodes PNG scanlines), so
+    nothing is decoded or held beyond one band.
+    """
+    png = iter_tree_png(tree, layout, routes, scale, **style)
+    next(png)  # signature; every later item is one whole chunk
+    width, height = struct.unpack(">II", next(png)[8:16])
+    page_width, page_height = (f"{extent:.2f}" for extent in layout.size)
+    content = f"q {page_width} 0 0 {page_height} 0 0 cm /Im0 Do Q".encode("ascii")
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width} {page_height}] "
+        "/Resources << /XObject << /Im0 5 0 R >> >> /Contents 4 0 R >>",
+        f"<< /Length {len(content)} >>\nstream\n{content.decode('ascii')}\nendstream",
+    ]
+    head = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(head))
+        head += f"{number} 0 obj\n{body}\nendobj\n"
+    # The image length is only known once the raster is drawn, so it is an indirect object after the stream
+    offsets.append(len(head))
+    head += (
+        f"5 0 obj\n<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceRGB "
+        f"/BitsPerComponent 8 /Filter /FlateDecode /DecodeParms << /Predictor 15 /Colors 3 /BitsPerComponent 8 "
+        f"/Columns {width} >> /Length 6 0 R >>\nstream\n"
+    )
+    yield head.encode("ascii")
+    length = 0
+    for chunk in png:
+        if chunk[4:8] == b"IDAT":
+            length += len(chunk) - 12
+            yield chunk[8:-4]
+    offsets.append(len(head) + length + len("\nendstream\nendobj\n"))
+    tail = f"\nendstream\nendobj\n6 0 obj\n{length}\nendobj\n"
+    xref = len(head) + length + len(tail)
+    yield (
+        tail + f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n"
+        + "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+        + f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    ).encode("ascii")
+
+def _html_payload(tree: OutlineTree, layout: TreeLayout, routes: EdgeRoutes, **meta) -> str:
+    """Packs a layout as a uint32 meta length, padded JSON meta and float32/int32 arrays, deflated and base64 encoded."""
+    meta.update(
+        nodes=len(layout), edges=len(routes.children), points_per_edge=routes.points.shape[1] if len(routes.children) else 2,
+        trunks=len(routes.trunks), size=[float(extent) for extent in layout.size],
+        labels=[tree.label(index) for index in range(len(layout))],
+    )
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    meta_bytes += b" " * (-len(meta_bytes) % 4)
+    parts = [struct.pack("<I", len(meta_bytes)), meta_bytes]
+    for values, dtype in ((layout.x, "<f4"), (layout.y, "<f4"), (layout.width, "<f4"), (layout.height, "<f4"),
+                          (layout.parents, "<i4"), (layout.depth, "<i4"), (routes.children, "<i4"),
+                          (routes.points, "<f4"), (routes.trunks, "<f4"), (routes.trunk_parents, "<i4")):
+        parts.append(np.ascontiguousarray(values, dtype=dtype).tobytes())
+    return base64.b64encode(zlib.compress(b"".join(parts), 9)).decode("ascii")
+
+def build_html_export(tree: OutlineTree, layout: TreeLayout, routes: EdgeRoutes, topic: str, collapsible: bool = False,
+    custom_css: str = "", hover_color: str = "#FFD700", font_size: int = 12, node_color: str = "#ADD8E6",
+    node_border_color: str = "#000000", node_border_width: int = 2, edge_color: str = "#888888", edge_style: str = "solid",
+    edge_arrow_size: float = 1.0, node_shape: str = "box", node_font: str = "Helvetica", node_font_color: str = "#000000",
+    bg_color: str = "#FFFFFF", **_
+) -> str:
+    """
+    Builds a standalone HTML page that draws the map on a canvas with pan,
+    zoom and, if collapsible, click-to-fold subtrees. Colors are CSS
+    variables on :root, so custom_css can restyle the map as well as the page.
+    """
+    variables = {
+        "--background": bg_color, "--node-fill": node_color, "--node-stroke": node_border_color,
+        "--node-stroke-width": node_border_width, "--edge-stroke": edge_color,
+        "--edge-width": 2 if edge_style == "bold" else 1, "--hover-fill": hover_color,
+        "--label-fill": node_font_color, "--label-font": f"{node_font}, sans-serif", "--font-size": font_size,
+    }
+    replacements = {
+        "__TITLE__": html.escape(f"Mind Map for {topic}"),
+        "__STYLE_VARIABLES__": " ".join(f"{name}: {value};" for name, value in variables.items()),
+        # Keep user CSS from closing the style element early
+        "__CUSTOM_CSS__": re.sub(r"</(?=style)", r"<\\/", custom_css or "", flags=re.IGNORECASE),
+        "__COLLAPSIBLE__": "true" if collapsible else "false",
+        "__INITIAL_DEPTH__": str(HTML_EXPORT_INITIAL_DEPTH),
+        "__PAYLOAD__": _html_payload(tree, layout, routes, node_shape=node_shape, edge_style=edge_style, arrow_size=edge_arrow_size),
+    }
+    return re.sub("|".join(replacements), lambda match: replacements[match.group(0)], HTML_EXPORT_TEMPLATE)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def laid_out_tree_svg(markdown_text: str, topic: str, max_depth: int, custom_root: str, hide_leaf_nodes: bool,
+    id_scheme: str, orientation: str, font_size: int, node_shape: str, edge_arrow_size: float, edge_routing: str,
+    watermark_text: str, enable_clustering: bool, animate_generation: bool, previous_markdown: str = ""
+) -> str:
+    """
+    Parses, lays out and draws the map with default paint. Keyed only by
+    LAYOUT_OPTIONS, so paint changes reuse it through restyle_svg. With
+    previous_markdown, nodes the new outline added are marked.
+    """
+    tree = parse_outline(
+        markdown_text, max_depth=max_depth, custom_root=custom_root, hide_leaf_nodes=hide_leaf_nodes, id_scheme=id_scheme
+    )
+    layout, routes = cached_tree_layout(tree, orientation, font_size, node_shape, edge_routing)
+    return render_tree_svg(
+        tree, layout, topic, font_size=font_size, node_shape=node_shape, edge_arrow_size=edge_arrow_size,
+        routes=routes, watermark_text=watermark_text, enable_clustering=enable_clustering, reveal_order=animate_generation,
+        added=outline_changes(
+            previous_markdown, markdown_text, max_depth, custom_root, hide_leaf_nodes, id_scheme
+        )[0] if previous_markdown else None
+    )
+
+def partial_tree_svg(tree: OutlineTree, topic: str, orientation: str, font_size: int, node_shape: str,
+    edge_routing: str, **style
+) -> str:
+    """
+    Draws an outline that is still streaming in. The whole map is not cached,
+    but the top-level branches it has finished keep their cached layouts.
+    """
+    layout, routes = cached_tree_layout(tree, orientation, font_size, node_shape, edge_routing, store=False)
+    return render_tree_svg(tree, layout, topic, font_size=font_size, node_shape=node_shape, routes=routes, **style)
+
+class ResponseCache:
+    """
+    Content-addressed cache for model responses.
+    An in-memory LRU tier sits in front of a SQLite tier on disk; both tiers
+    evict by entry count and expire entries older than the TTL.
+    """
+
+    def __init__(self, db_path: str, max_memory_entries: int = RESPONSE_CACHE_MEMORY_ENTRIES,
+        max_disk_entries: int = RESPONSE_CACHE_DISK_ENTRIES, ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        try:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, created_at REAL, accessed_at REAL, text TEXT)"
+            )
+            self._db.commit()
+        except (OSError, sqlite3.Error):
+            # Fall back to the memory tier only (e.g. read-only filesystem).
+            self._db = None
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, params: dict) -> str:
+        """Hashes everything that determines the model output."""
+        payload = json.dumps([model_name, prompt, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return now - created_at > self.ttl_seconds
+
+    def get(self, key: str):
+        """Returns the cached text for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    return entry[1]
+                del self._memory[key]
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute(
+                    "SELECT created_at, text FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if self._expired(row[0], now):
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    return None
+                self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                self._db.commit()
+            except sqlite3.Error:
+                return None
+            self._remember(key, row[0], row[1])
+            return row[1]
+
+    def put(self, key: str, text: str):
+        """Stores text under key in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, text)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, created_at, accessed_at, text) VALUES (?, ?, ?, ?)",
+                    (key, now, now, text)
+                )
+                self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+                self._db.execute(
+                    "DELETE FROM responses WHERE key NOT IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?)",
+                    (self.max_disk_entries,)
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+    def _remember(self, key: str, created_at: float, text: str):
+        self._memory[key] = (created_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+class RenderCache:
+    """
+    Cache of rendered exports keyed by (DOT source hash, format, engine).
+    Entries live in a memory LRU bounded by total bytes and, optionally, in a
+    directory on disk with its own byte budget so renders survive restarts.
+    """
+
+    def __init__(self, max_bytes: int = RENDER_CACHE_MAX_BYTES, disk_dir: str = None,
+        max_disk_bytes: int = RENDER_CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = disk_dir
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            try:
+                os.makedirs(disk_dir, exist_ok=True)
+                entries = sorted(os.scandir(disk_dir), key=lambda entry: entry.stat().st_mtime)
+                for entry in entries:
+                    size = entry.stat().st_size
+                    self._disk[entry.name] = size
+                    self._disk_bytes += size
+            except OSError:
+                self.disk_dir = None
+
+    @staticmethod
+    def make_key(source, fmt: str, engine: str) -> str:
+        """source is DOT text or an iterable of chunks (e.g. a graphviz.Digraph), hashed without joining them."""
+        digest = hashlib.sha256()
+        for chunk in ((source,) if isinstance(source, str) else source):
+            digest.update(chunk.encode("utf-8"))
+        return f"{digest.hexdigest()}.{engine}.{fmt}"
+
+    def get(self, key: str):
+        """Returns the cached bytes for key, or None on a miss."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+            if not self.disk_dir or key not in self._disk:
+                return None
+            try:
+                with open(os.path.join(self.disk_dir, key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                self._forget_disk(key)
+                return None
+            self._disk.move_to_end(key)
+            self._remember(key, data)
+            return data
+
+    def put(self, key: str, data: bytes):
+        with self._lock:
+            self._remember(key, data)
+            if not self.disk_dir or len(data) > self.max_disk_bytes:
+                return
+            try:
+                # Write to a temp file first so readers never see a partial render
+                tmp_path = os.path.join(self.disk_dir, f".{key}.{threading.get_ident()}.tmp")
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, os.path.join(self.disk_dir, key))
+            except OSError:
+                return
+            self._forget_disk(key)
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            while self._disk_bytes > self.max_disk_bytes:
+                old_key = next(iter(self._disk))
+                try:
+                    os.remove(os.path.join(self.disk_dir, old_key))
+                except OSError:
+                    pass
+                self._forget_disk(old_key)
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+
+    def _forget_disk(self, key: str):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+
+@st.cache_resource
+def get_render_cache() -> RenderCache:
+    """Process-wide render cache shared by all sessions."""
+    disk_dir = os.path.join(CACHE_DIR, "renders") if RENDER_CACHE_PERSIST else None
+    return RenderCache(disk_dir=disk_dir)
+
+@st.cache_resource
+def get_layout_cache() -> RenderCache:
+    """Process-wide cache of packed native layouts, persisted so they survive restarts."""
+    return RenderCache(
+        max_bytes=LAYOUT_CACHE_MAX_BYTES, disk_dir=os.path.join(CACHE_DIR, "layouts"),
+        max_disk_bytes=LAYOUT_CACHE_DISK_MAX_BYTES
+    )
+
+def layout_cache_key(tree: OutlineTree, orientation: str, font_size: int, node_shape: str, edge_routing: str) -> str:
+    """
+    Hashes exactly what native positions depend on: tree shape, label text and
+    the geometry options. Colors and the font family are left out because
+    estimate_node_sizes does not depend on them.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(tree.parents.tobytes())
+    digest.update(tree.label_offsets.tobytes())
+    digest.update(tree.labels_buffer.encode("utf-8"))
+    digest.update(repr((LAYOUT_CACHE_VERSION, orientation, font_size, node_shape, edge_routing)).encode("utf-8"))
+    return f"{digest.hexdigest()}.native.npz"
+
+def branch_layout_key(parents: np.ndarray, label_lengths: np.ndarray, start: int, stop: int, horizontal: bool,
+    font_size: int, node_shape: str
+) -> str:
+    """Like layout_cache_key for one top-level branch, which depends only on its shape and label lengths."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(np.maximum(parents[start:stop] - start, -1).astype(np.int32).tobytes())
+    digest.update(label_lengths[start:stop].tobytes())
+    digest.update(repr((LAYOUT_CACHE_VERSION, horizontal, font_size, node_shape)).encode("utf-8"))
+    return f"{digest.hexdigest()}.branch.npz"
+
+def branch_tidy_layout(tree: OutlineTree, orientation: str = "Left-Right (LR)", font_size: int = 12,
+    node_shape: str = "box", store: bool = True
+) -> TreeLayout:
+    """
+    Tidy layout assembled from separately cached top-level branches, so a
+    regenerated map only lays out the branches whose shape or label lengths
+    changed. Branches under BRANCH_LAYOUT_MIN_NODES are laid out together in
+    one pass every time. Falls back to tidy_tree_layout when branches are
+    not contiguous. With store=False the last branch, which may still be
+    growing, is not written to the cache.
+    """
+    parents = np.frombuffer(tree.parents, dtype=np.int32)
+    spans = branch_spans(parents)
+    if spans is None:
+        return tidy_tree_layout(tree, orientation, font_size=font_size, node_shape=node_shape)
+    starts, stops = spans
+    rankdir = ORIENTATION_MAP.get(orientation, "LR")
+    horizontal = rankdir in ("LR", "RL")
+    width, height = estimate_node_sizes(tree, font_size, node_shape)
+    label_lengths = np.diff(np.frombuffer(tree.label_offsets, dtype=np.uint32))
+    head = int(starts[0])
+    position = np.empty(len(parents) - head)
+    depth = np.empty(len(parents) - head, dtype=np.int32)
+    bands = np.zeros(len(starts))
+    selected = np.ones(len(starts), dtype=bool)
+    cache = get_layout_cache()
+    keys = {}
+    for index in np.flatnonzero(stops - starts >= BRANCH_LAYOUT_MIN_NODES).tolist():
+        start, stop = int(starts[index]), int(stops[index])
+        keys[index] = branch_layout_key(parents, label_lengths, start, stop, horizontal, font_size, node_shape)
+        data = cache.get(keys[index])
+        if data is not None:
+            with np.load(io.BytesIO(data)) as arrays:
+                position[start - head:stop - head] = arrays["position"]
+                depth[start - head:stop - head] = arrays["depth"]
+                bands[index] = float(arrays["band"])
+            selected[index] = False
+    if selected.any():
+        nodes, laid_position, laid_depth, bands[selected] = tidy_branch_layouts(
+            parents, starts, stops, selected, height if horizontal else width
+        )
+        position[nodes - head] = laid_position
+        depth[nodes - head] = laid_depth
+        for index, key in keys.items():
+            if selected[index] and (store or index < len(starts) - 1):
+                low, high = starts[index] - head, stops[index] - head
+                buffer = io.BytesIO()
+                np.savez(buffer, position=position[low:high], depth=depth[low:high], band=np.array(bands[index]))
+                cache.put(key, buffer.getvalue())
+    return compose_tidy_layout(parents, width, height, rankdir, starts, stops, position, depth, bands)
+
+def _pack_layout(layout: TreeLayout, routes: EdgeRoutes) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(
+        buffer, x=layout.x, y=layout.y, width=layout.width, height=layout.height,
+        depth=layout.depth.astype(np.int32), rankdir=np.array(layout.rankdir), size=np.array(layout.size),
+        children=routes.children, points=routes.points, trunks=routes.trunks, trunk_parents=routes.trunk_parents
+    )
+    return buffer.getvalue()
+
+def _unpack_layout(data: bytes, tree: OutlineTree):
+    with np.load(io.BytesIO(data)) as arrays:
+        layout = TreeLayout(
+            arrays["x"], arrays["y"], arrays["width"], arrays["height"], arrays["depth"],
+            np.frombuffer(tree.parents, dtype=np.int32), str(arrays["rankdir"]), tuple(arrays["size"].tolist())
+        )
+        return layout, EdgeRoutes(arrays["children"], arrays["points"], arrays["trunks"], arrays["trunk_parents"])
+
+def cached_tree_layout(tree: OutlineTree, orientation: str = "Left-Right (LR)", font_size: int = 12,
+    node_shape: str = "box", edge_routing: str = "elbow", store: bool = True
+):
+    """
+    Returns (TreeLayout, EdgeRoutes), laying out and routing only on a cache
+    miss. Mirrored orientations reuse the cached layout of their source, and
+    tidy layouts reuse the cached layouts of unchanged top-level branches.
+    With store=False (for outlines still streaming in) a miss is not written
+    back, nor is the tidy layout of the last top-level branch, which may be
+    unfinished; finished branches are cached for the full map to reuse.
+    """
+    if orientation in MIRRORED_ORIENTATIONS:
+        source, axis = MIRRORED_ORIENTATIONS[orientation]
+        layout, routes = cached_tree_layout(tree, source, font_size, node_shape, edge_routing, store)
+        return mirror_tree_layout(layout, routes, axis, ORIENTATION_MAP[orientation])
+    if orientation == RADIAL_ORIENTATION:
+        edge_routing = "straight"  # route_tree_edges ignores routing for radial layouts
+    cache = get_layout_cache()
+    key = layout_cache_key(tree, orientation, font_size, node_shape, edge_routing)
+    data = cache.get(key)
+    if data is not None:
+        return _unpack_layout(data, tree)
+    if orientation == RADIAL_ORIENTATION:
+        layout = radial_tree_layout(tree, font_size=font_size, node_shape=node_shape)
+    else:
+        layout = branch_tidy_layout(tree, orientation, font_size=font_size, node_shape=node_shape, store=store)
+    routes = route_tree_edges(layout, edge_routing)
+    if store:
+        cache.put(key, _pack_layout(layout, routes))
+    return layout, routes
+
+@st.cache_resource
+def graphviz_available() -> bool:
+    """Probes once per process whether the Graphviz executables are installed."""
+    try:
+        graphviz.version()
+        return True
+    except (graphviz.ExecutableNotFound, graphviz.CalledProcessError, RuntimeError):
+        return False
+
+def _run_graphviz(source, engine: str, fmt: str, neato_no_op: int = None, timeout: float = None,
+    on_start=None
+) -> bytes:
+    """
+    Pipes DOT through a Graphviz engine and returns the output bytes (no temp files).
+    source is DOT text or an iterable of DOT chunks (e.g. a graphviz.Digraph or
+    iter_mind_map_dot), written to stdin as they are produced, so the whole
+    document is never joined in memory. on_start is called with the Popen
+    object, so a caller can kill the process early.
+    Raises subprocess.TimeoutExpired (after killing the process) if timeout is exceeded.
+    """
+    cmd = [engine, f"-T{fmt}"]
+    if neato_no_op:
+        cmd.append(f"-n{int(neato_no_op)}")
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if on_start:
+        on_start(proc)
+    timed_out = threading.Event()
+    failures, stderr = [], []
+
+    def feed():
+        try:
+            for chunk in ((source,) if isinstance(source, str) else source):
+                proc.stdin.write(chunk.encode("utf-8"))
+        except (BrokenPipeError, ValueError):
+            pass  # The engine exited early or was killed; its exit status says why
+        except Exception as e:
+            failures.append(e)
+            proc.kill()
+        finally:
+            with contextlib.suppress(OSError):
+                proc.stdin.close()
+
+    def expire():
+        timed_out.set()
+        proc.kill()
+
+    workers = [threading.Thread(target=feed, daemon=True),
+               threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)]
+    timer = threading.Timer(max(timeout, 0.0), expire) if timeout is not None else None
+    for worker in workers:
+        worker.start()
+    if timer:
+        timer.start()
+    try:
+        output = proc.stdout.read()
+        proc.wait()
+    finally:
+        if timer:
+            timer.cancel()
+        for worker in workers:
+            worker.join()
+        proc.stdout.close()
+        proc.stderr.close()
+    if failures:
+        raise failures[0]
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout, output=output, stderr=stderr[0] if stderr else None)
+    if proc.returncode != 0:
+        raise graphviz.CalledProcessError(proc.returncode, cmd, output=output, stderr=stderr[0] if stderr else b"")
+    return output
+
+def layout_graph(graph: graphviz.Digraph, timeout: float = None) -> str:
+    """
+    Runs the layout engine once and returns positioned DOT (node pos and edge
+    splines filled in). Cached like any other render.
+    """
+    cache = get_render_cache()
+    cache_key = cache.make_key(graph, "layout", graph.engine)
+    data = cache.get(cache_key)
+    if data is None:
+        data = _run_graphviz(graph, graph.engine, "dot", timeout=timeout)
+        cache.put(cache_key, data)
+    return data.decode("utf-8")
+
+@st.cache_resource
+def get_layout_executor() -> ThreadPoolExecutor:
+    """Worker pool for per-cluster dot runs; each is its own process, so threads suffice."""
+    return ThreadPoolExecutor(max_workers=LAYOUT_WORKERS, thread_name_prefix="mindmap-layout")
+
+def _shift_pos(pos: str, dx: float, dy: float) -> str:
+    """Translates a Graphviz pos value: "x,y" for nodes, or an edge spline with optional "e,"/"s," endpoints."""
+    points = []
+    for point in pos.split():
+        *prefix, x, y = point.split(",")
+        points.append(",".join(prefix + [f"{float(x) + dx:.2f}", f"{float(y) + dy:.2f}"]))
+    return " ".join(points)
+
+def _straight_spline(start, tip, arrow_size: float) -> str:
+    """Edge pos for a straight Bezier from start to an arrowhead ending at tip."""
+    (x0, y0), (x1, y1) = start, tip
+    length = max(((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5, 1e-9)
+    back = min(10.0 * arrow_size, length) / length
+    ex, ey = x1 - (x1 - x0) * back, y1 - (y1 - y0) * back
+    controls = " ".join(f"{x0 + (ex - x0) * t:.2f},{y0 + (ey - y0) * t:.2f}" for t in (0.0, 1 / 3, 2 / 3, 1.0))
+    return f"e,{x1:.2f},{y1:.2f} {controls}"
+
+def layout_clustered_graph(tree: OutlineTree, topic: str, graph: graphviz.Digraph, timeout: float = None,
+    watermark_text: str = "", graph_layout: str = "Auto", cluster_palette: str = "Default", **style
+) -> str:
+    """
+    Positions a clustered graph by running dot once per top-level branch, in
+    parallel, instead of once over the whole map. Each run includes the
+    shared root, so every branch starts on the same rank. The branches are
+    then packed side by side along the sibling axis and the root is centered
+    in front of them. The packed, positioned DOT is cached as graph's layout,
+    so render_graph serializes it through neato -n2 like any other layout.
+    timeout bounds the whole layout, not each branch: if it runs out or any
+    branch fails, queued branches are cancelled and running ones killed.
+    """
+    cache = get_render_cache()
+    cache_key = cache.make_key(graph, "layout", graph.engine)
+    data = cache.get(cache_key)
+    if data is not None:
+        return data.decode("utf-8")
+    parents = np.frombuffer(tree.parents, dtype=np.int32)
+    clusters = branch_clusters(parents)
+    count = int(clusters.max()) + 1
+    if count < 2:
+        return layout_graph(graph, timeout=timeout)
+    shared_roots = np.flatnonzero(clusters < 0).tolist()
+
+    order = np.argsort(clusters, kind="stable")
+    bounds = np.searchsorted(clusters[order], np.arange(count + 1))
+    members = [order[bounds[cluster]:bounds[cluster + 1]].tolist() for cluster in range(count)]
+    node_ids = [_dot_quote(tree.node_id(index)) for index in range(len(tree))]
+    executor = get_layout_executor()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    processes, processes_lock, cancelled = [], threading.Lock(), threading.Event()
+
+    def track(proc):
+        with processes_lock:
+            if cancelled.is_set():
+                proc.kill()
+            processes.append(proc)
+
+    def run_branch(branch):
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if cancelled.is_set() or (remaining is not None and remaining <= 0):
+            raise subprocess.TimeoutExpired("dot", timeout)
+        return _run_graphviz(branch, "dot", "json0", timeout=remaining, on_start=track)
+
+    futures = []
+    for cluster in range(count):
+        branch = _styled_digraph(tree, topic, graph_layout, **style)
+        branch.body.extend(f"\t{node_ids[index]} [label={_dot_quote(tree.label(index))}]\n" for index in shared_roots)
+        for index in members[cluster]:
+            branch.body.append(f"\t{node_ids[index]} [label={_dot_quote(tree.label(index))}]\n")
+            if parents[index] >= 0:
+                branch.body.append(f"\t{node_ids[parents[index]]} -> {node_ids[index]}\n")
+        futures.append(executor.submit(run_branch, branch))
+    try:
+        done, not_done = wait(
+            futures, timeout=None if deadline is None else max(deadline - time.monotonic(), 0.0),
+            return_when=FIRST_EXCEPTION
+        )
+        failed = next((future for future in done if future.exception() is not None), None)
+        if failed is not None:
+            raise failed.exception()
+        if not_done:
+            raise subprocess.TimeoutExpired("dot", timeout)
+        results = [json.loads(future.result()) for future in futures]
+    except BaseException:
+        with processes_lock:
+            cancelled.set()
+            for future in futures:
+                future.cancel()
+            for proc in processes:
+                proc.kill()
+        raise
+
+    # Graphviz coordinates are points with y pointing up
+    rankdir = ORIENTATION_MAP.get(style.get("orientation"), "LR")
+    sibling_axis = 1 if rankdir in ("LR", "RL") else 0
+    rank_axis = 1 - sibling_axis
+    root_names = {tree.node_id(index) for index in shared_roots}
+    boxes, splines, root_box = {}, [], None
+    cursor = 0.0
+    # LR/RL stack branches downwards from the top, TB/BT left to right, so outline order reads naturally
+    for cluster in (range(count) if sibling_axis == 0 else reversed(range(count))):
+        result = results[cluster]
+        nodes = {
+            item["_gvid"]: item for item in result.get("objects", []) if "pos" in item and "nodes" not in item
+        }
+        centers = {
+            item["name"]: tuple(float(value) for value in item["pos"].split(",")) for item in nodes.values()
+        }
+        sizes = {
+            item["name"]: (float(item["width"]) * 72, float(item["height"]) * 72) for item in nodes.values()
+        }
+        branch_names = [name for name in centers if name not in root_names]
+        low = min(centers[name][sibling_axis] - sizes[name][sibling_axis] / 2 for name in branch_names)
+        high = max(centers[name][sibling_axis] + sizes[name][sibling_axis] / 2 for name in branch_names)
+        # Align every branch so its copy of the shared root (or its own root) sits on rank coordinate 0
+        anchor = next(iter(root_names)) if root_names else tree.node_id(members[cluster][0])
+        shift = [0.0, 0.0]
+        shift[sibling_axis] = cursor - low
+        shift[rank_axis] = -centers[anchor][rank_axis]
+        root_box = sizes[anchor]
+        cursor += high - low + LAYOUT_CLUSTER_GAP
+        for name in branch_names:
+            boxes[name] = ((centers[name][0] + shift[0], centers[name][1] + shift[1]), sizes[name], cluster)
+        for edge in result.get("edges", []):
+            tail, head = nodes[edge["tail"]]["name"], nodes[edge["head"]]["name"]
+            if tail in root_names:
+                continue
+            pos = _shift_pos(edge["pos"], *shift) if "pos" in edge else None
+            splines.append((tail, head, pos))
+
+    root_center = None
+    if root_names:
+        root_name = next(iter(root_names))
+        tops = [tree.node_id(index) for index in np.flatnonzero(parents == shared_roots[0]).tolist()]
+        center = [0.0, 0.0]
+        center[sibling_axis] = (boxes[tops[0]][0][sibling_axis] + boxes[tops[-1]][0][sibling_axis]) / 2
+        root_center = tuple(center)
+        for top in tops:
+            top_center, top_size, _ = boxes[top]
+            start, tip = list(root_center), list(top_center)
+            # Leave the root on its far side and enter each branch on its near side
+            direction = 1.0 if top_center[rank_axis] > root_center[rank_axis] else -1.0
+            start[rank_axis] += direction * root_box[rank_axis] / 2
+            tip[rank_axis] -= direction * top_size[rank_axis] / 2
+            splines.append((root_name, top, _straight_spline(start, tip, style.get("edge_arrow_size", 1.0))))
+
+    # Move everything so the drawing starts at the origin
+    all_boxes = list(boxes.values()) + ([(root_center, root_box, -1)] if root_center else [])
+    margin = LAYOUT_CLUSTER_GAP / 2
+    min_x = min(c[0] - size[0] / 2 for c, size, _ in all_boxes) - margin
+    min_y = min(c[1] - size[1] / 2 for c, size, _ in all_boxes) - margin
+    max_x = max(c[0] + size[0] / 2 for c, size, _ in all_boxes) + margin
+    max_y = max(c[1] + size[1] / 2 for c, size, _ in all_boxes) + margin
+    dx, dy = -min_x, -min_y
+
+    name_index = {tree.node_id(index): index for index in range(len(tree))}
+
+    def node_statement(name, center, size, indent):
+        index = name_index[name]
+        return (f'{indent}{node_ids[index]} [label={_dot_quote(tree.label(index))} '
+                f'pos="{center[0] + dx:.2f},{center[1] + dy:.2f}" width={size[0] / 72:.4f} height={size[1] / 72:.4f}]\n')
+
+    positioned = _styled_digraph(tree, topic, graph_layout, **style)
+    positioned.attr(bb=f"0,0,{max_x - min_x:.2f},{max_y - min_y:.2f}")
+    if root_center:
+        positioned.body.append(node_statement(root_name, root_center, root_box, "\t"))
+    by_cluster = [[] for _ in range(count)]
+    for name, (center, size, cluster) in boxes.items():
+        by_cluster[cluster].append((name, center, size))
+    for cluster, entries in enumerate(by_cluster):
+        x0 = min(c[0] - size[0] / 2 for _, c, size in entries) - margin / 2 + dx
+        y0 = min(c[1] - size[1] / 2 for _, c, size in entries) - margin / 2 + dy
+        x1 = max(c[0] + size[0] / 2 for _, c, size in entries) + margin / 2 + dx
+        y1 = max(c[1] + size[1] / 2 for _, c, size in entries) + margin / 2 + dy
+        positioned.body.append(_cluster_header(cluster, cluster_palette, bb=f"{x0:.2f},{y0:.2f},{x1:.2f},{y1:.2f}"))
+        positioned.body.extend(node_statement(name, center, size, "\t\t") for name, center, size in entries)
+        positioned.body.append("\t}\n")
+    for tail, head, pos in splines:
+        attrs = f' [pos="{_shift_pos(pos, dx, dy)}"]' if pos else ""
+        positioned.body.append(f"\t{_dot_quote(tail)} -> {_dot_quote(head)}{attrs}\n")
+    _add_watermark(positioned, watermark_text)
+    cache.put(cache_key, positioned.source.encode("utf-8"))
+    return positioned.source
+
+@st.cache_resource
+def get_layout_timeouts() -> OrderedDict:
+    """Layouts (by cache key) that already blew the deadline, so reruns skip straight to a cheaper tier."""
+    return OrderedDict()
+
+def _layout_tiers(tree: OutlineTree, topic: str, **style):
+    """Yields (tier_name, graph) from the requested layout down to progressively cheaper ones."""
+    graph = build_mind_map_digraph(tree, topic, **style)
+    yield "full", graph
+    no_splines = graph.copy()
+    no_splines.attr(splines="false")
+    yield "edge routing off", no_splines
+    fast = no_splines.copy()
+    fast.engine = "sfdp"
+    fast.attr(overlap="prism")
+    yield "sfdp", fast
+    preview = build_mind_map_digraph(tree.prune(LAYOUT_PREVIEW_DEPTH), topic, **dict(style, graph_layout="dot"))
+    preview.attr(splines="false")
+    yield f"preview (first {LAYOUT_PREVIEW_DEPTH} levels)", preview
+
+def layout_with_deadline(tree: OutlineTree, topic: str, deadline: float = LAYOUT_DEADLINE_SECONDS, **style):
+    """
+    Lays the map out server-side within deadline seconds in total, killing
+    any tier that runs out of time and retrying on the next cheaper one. Each
+    tier but the last may use LAYOUT_TIER_SHARE of the time left, so the
+    cheaper tiers always get a turn. Returns (tier_name, graph); the graph's
+    layout is cached, so rendering or exporting it does not lay it out again.
+    """
+    deadline_at = time.monotonic() + deadline
+    timed_out = get_layout_timeouts()
+    tiers = list(_layout_tiers(tree, topic, **style))
+    for position, (tier, graph) in enumerate(tiers):
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            break
+        budget = remaining if position == len(tiers) - 1 else remaining * LAYOUT_TIER_SHARE
+        cache_key = RenderCache.make_key(graph, "layout", graph.engine)
+        if timed_out.get(cache_key, 0.0) >= budget:
+            continue
+        try:
+            if tier == "full" and style.get("cluster_palette") and graph.engine == "dot" \
+                    and tree.node_count >= LAYOUT_CLUSTER_PARALLEL_MIN_NODES:
+                layout_clustered_graph(tree, topic, graph, timeout=budget, **style)
+            else:
+                layout_graph(graph, timeout=budget)
+            return tier, graph
+        except subprocess.TimeoutExpired:
+            timed_out[cache_key] = max(timed_out.get(cache_key, 0.0), budget)
+            while len(timed_out) > 1000:
+                timed_out.popitem(last=False)
+    raise TimeoutError(f"No layout tier finished within the {deadline:g}s deadline.")
+
+def _time_left(deadline_at: float, what: str) -> float:
+    """Seconds until deadline_at; raises subprocess.TimeoutExpired if it has passed."""
+    remaining = deadline_at - time.monotonic()
+    if remaining <= 0:
+        raise subprocess.TimeoutExpired(what, 0)
+    return remaining
+
+def _serialize_graph(positioned: str, fmt: str, deadline_at: float) -> bytes:
+    """Writes a positioned layout as fmt with neato -n2, within what is left until deadline_at."""
+    return _run_graphviz(positioned, "neato", fmt, neato_no_op=2, timeout=_time_left(deadline_at, "neato"))
+
+def render_graph(graph: graphviz.Digraph, fmt: str, timeout: float = LAYOUT_DEADLINE_SECONDS) -> bytes:
+    """
+    Renders graph to fmt, reusing a cached render of identical DOT source.
+    All formats are serialized from the same positioned layout (neato -n2
+    keeps the existing coordinates), so layout runs once per graph. Layout
+    (if not cached yet) and serialization together are bounded by timeout;
+    use layout_with_deadline first to fall back to a cheaper tier instead.
+    """
+    cache = get_render_cache()
+    cache_key = cache.make_key(graph, fmt, graph.engine)
+    data = cache.get(cache_key)
+    if data is None:
+        deadline_at = time.monotonic() + timeout
+        data = _serialize_graph(layout_graph(graph, timeout=timeout), fmt, deadline_at)
+        cache.put(cache_key, data)
+    return data
+
+@st.cache_resource
+def get_export_executor() -> ThreadPoolExecutor:
+    """Bounded worker pool shared by all sessions for export renders."""
+    return ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="mindmap-export")
+
+def render_exports(graph: graphviz.Digraph, formats, timeout: float = LAYOUT_DEADLINE_SECONDS):
+    """
+    Renders several formats concurrently from one shared layout, with layout
+    and every serialization run bounded by one overall timeout.
+    Yields (fmt, data, error) tuples in completion order; cached formats come first.
+    """
+    cache = get_render_cache()
+    pending = {}
+    for fmt in formats:
+        cache_key = cache.make_key(graph, fmt, graph.engine)
+        data = cache.get(cache_key)
+        if data is not None:
+            yield fmt, data, None
+        else:
+            pending[fmt] = cache_key
+    if not pending:
+        return
+    deadline_at = time.monotonic() + timeout
+    try:
+        positioned = layout_graph(graph, timeout=timeout)
+    except Exception as e:
+        for fmt in pending:
+            yield fmt, None, e
+        return
+    executor = get_export_executor()
+    futures = {executor.submit(_serialize_graph, positioned, fmt, deadline_at): fmt for fmt in pending}
+    for future in as_completed(futures):
+        fmt = futures[future]
+        try:
+            data = future.result()
+        except Exception as e:
+            yield fmt, None, e
+            continue
+        cache.put(pending[fmt], data)
+        yield fmt, data, None
+
+def render_native_exports(tree: OutlineTree, layout: TreeLayout, routes: EdgeRoutes, formats, **style):
+    """
+    Draws PNG and PDF exports from the native layout, so they match the chart
+    and need no Graphviz. Yields (fmt, data, error) tuples like render_exports.
+    """
+    for fmt in formats:
+        dpi = NATIVE_PDF_DPI if fmt == "pdf" else NATIVE_PNG_DPI
+        scale = high_res_scale(layout.size, dpi, HIGH_RES_DEFAULT_MAX_MEGAPIXELS * 10**6)
+        try:
+            chunks = iter_tree_pdf if fmt == "pdf" else iter_tree_png
+            data = b"".join(chunks(tree, layout, routes, scale, **style))
+        except Exception as e:
+            yield fmt, None, e
+            continue
+        yield fmt, data, None
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache shared by all sessions."""
+    return ResponseCache(os.path.join(CACHE_DIR, "responses.sqlite3"))
+
+def generate_mind_map(topic: str, use_cache: bool = True):
+    """
+    Calls the Gemini API to generate the mind map markdown.
+    Responses are cached by (model, prompt, generation params); pass
+    use_cache=False to force a fresh generation (the result is still stored).
+    """
     prompt = MIND_MAP_PROMPT.format(topic=topic)
+    cache = get_response_cache()
+    cache_key = cache.make_key(MODEL_NAME, prompt, GENERATION_PARAMS)
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+    model = genai.GenerativeModel(MODEL_NAME, generation_config=GENERATION_PARAMS or None)
     response = model.generate_content(prompt)
+    cache.put(cache_key, response.text)
     return response.text
 
+def stream_mind_map(topic: str, use_cache: bool = True):
+    """
+    Streaming variant of generate_mind_map: yields the markdown in chunks as the
+    model produces them. A cache hit is yielded as a single chunk.
+    """
+    prompt = MIND_MAP_PROMPT.format(topic=topic)
+    cache = get_response_cache()
+    cache_key = cache.make_key(MODEL_NAME, prompt, GENERATION_PARAMS)
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+    model = genai.GenerativeModel(MODEL_NAME, generation_config=GENERATION_PARAMS or None)
+    chunks = []
+    for chunk in model.generate_content(prompt, stream=True):
+        chunks.append(chunk.text)
+        yield chunk.text
+    cache.put(cache_key, "".join(chunks))
+
 # --- Streamlit UI ---
 
 st.title("🧠 Mind-Map Generator")
@@ -165,7 +2637,7 @@ theme = st.sidebar.selectbox("Theme", ["Light", "Dark", "Custom"])
 max_depth = st.sidebar.slider("Mind Map Depth Limit", min_value=1, max_value=10, value=5)
 show_markdown = st.sidebar.checkbox("Show Raw Markdown", value=True)
 show_export = st.sidebar.checkbox("Show Export Options", value=True)
-orientation = st.sidebar.selectbox("Orientation", ["Left-Right (LR)", "Top-Bottom (TB)", "Right-Left (RL)", "Bottom-Top (BT)"], index=0)
+orientation = st.sidebar.selectbox("Orientation", list(ORIENTATION_MAP) + [RADIAL_ORIENTATION], index=0)
 font_size = st.sidebar.slider("Node Font Size", min_value=8, max_value=32, value=12)
 node_color = st.sidebar.color_picker("Node Color", "#ADD8E6")
 regenerate = st.sidebar.button("🔄 Regenerate Mind Map")
@@ -243,6 +2715,9 @@ edge_animation = st.sidebar.checkbox("Enable Edge Animation", value=False)
 enable_node_collapse = st.sidebar.checkbox("Enable Node Collapse/Expand", value=False)
 # 31. Mind map minimap
 show_minimap = st.sidebar.checkbox("Show Minimap", value=False)
+minimap_zoom = st.sidebar.slider("Viewport Zoom", 1.0, 16.0, 1.0) if show_minimap else 1.0
+minimap_center_x = st.sidebar.slider("Viewport Center X", 0.0, 1.0, 0.5) if show_minimap else 0.5
+minimap_center_y = st.sidebar.slider("Viewport Center Y", 0.0, 1.0, 0.5) if show_minimap else 0.5
 # 32. Node clustering/grouping
 enable_clustering = st.sidebar.checkbox("Enable Node Clustering", value=False)
 # 33. Node group color palette
@@ -289,11 +2764,19 @@ edge_dash_pattern = st.sidebar.text_input("Edge Dash Pattern", value="5,5")
 # 52. Node border style detail
 node_border_style = st.sidebar.selectbox("Node Border Style", ["solid", "dashed", "dotted", "double"])
 # 53. Graph layout selection
-graph_layout = st.sidebar.selectbox("Graph Layout", ["dot", "neato", "fdp", "sfdp", "twopi", "circo"])
+graph_layout = st.sidebar.selectbox(
+    "Graph Layout", ["Auto"] + GRAPH_LAYOUT_ENGINES,
+    help="Auto picks the engine, edge routing and layout effort from the map size."
+)
 # 54. Node color gradient option
 node_color_gradient = st.sidebar.checkbox("Enable Node Color Gradient", value=False)
 # 55. Export as high-resolution image
 export_high_res = st.sidebar.checkbox("Export as High-Resolution Image", value=False)
+high_res_dpi = st.sidebar.slider("High-Resolution DPI", 72, 1200, HIGH_RES_DEFAULT_DPI, step=24) if export_high_res else HIGH_RES_DEFAULT_DPI
+high_res_max_megapixels = (
+    st.sidebar.number_input("High-Resolution Max Megapixels", 1, 4000, HIGH_RES_DEFAULT_MAX_MEGAPIXELS)
+    if export_high_res else HIGH_RES_DEFAULT_MAX_MEGAPIXELS
+)
 
 # --- Super Advanced AI & Interactive Features ---
 st.sidebar.markdown("---")
@@ -315,6 +2798,35 @@ generate_summary = st.sidebar.button("Generate AI Summary of Map", help="Use AI
 ai_question = st.sidebar.text_input("Ask a question about the map's content", help="Use AI to answer questions based on the mind map.")
 ask_ai_button = st.sidebar.button("Ask AI")
 
+# 61. Node ID scheme
+node_id_scheme = st.sidebar.selectbox(
+    "Node ID Scheme", ["Readable", "Stable Path Hash"],
+    help="Path-hash IDs stay the same across regenerations for unchanged branches."
+)
+id_scheme = "path" if node_id_scheme == "Stable Path Hash" else "readable"
+
+# 62. Rendering backend
+render_backend = st.sidebar.selectbox(
+    "Rendering Backend", RENDER_BACKENDS,
+    help="The native tree layout draws the map directly with a few array passes per outline level; Graphviz uses the Graph Layout engine."
+)
+# 63. Native edge routing
+edge_routing = st.sidebar.selectbox(
+    "Edge Routing (Native)", ["Elbow", "Bus", "Straight"],
+    help="Elbow and bus connectors are computed directly from the tree layout."
+).lower()
+# 64. Regeneration diff
+highlight_changes = st.sidebar.checkbox(
+    "Highlight Regeneration Changes", value=True,
+    help="After a regeneration, outline nodes the new map added and list the ones it removed."
+)
+
+# 65. Progressive rendering
+progressive_rendering = st.sidebar.checkbox(
+    "Progressive Rendering", value=True,
+    help=f"Large maps show their first {LAYOUT_PREVIEW_DEPTH} levels right away and swap in the full map when it is ready."
+)
+
 # --- Main App Logic ---
 if not api_key:
     st.info("Please enter your Google API Key in the sidebar to use the generator.")
@@ -330,133 +2842,332 @@ except Exception as e:
 
 topic_seed = st.text_input("Enter a topic seed:", "The Link Data Structure")
 
-if st.button("✨ Generate Mind Map", disabled=not topic_seed) or regenerate:
+style_options = apply_theme(dict(
+    orientation=orientation,
+    font_size=font_size,
+    node_color=node_color,
+    node_border_color=node_border_color,
+    node_border_width=node_border_width,
+    edge_color=edge_color,
+    edge_style=edge_style,
+    edge_arrow_size=edge_arrow_size,
+    node_shape=node_shape,
+    node_font=node_font,
+    node_font_color=node_font_color,
+    edge_font_color=edge_font_color,
+    edge_font_size=edge_font_size,
+    bg_color=bg_color,
+    watermark_text=watermark_text,
+    graph_layout=graph_layout,
+    cluster_palette=group_color_palette if enable_clustering else None
+), theme, colorblind_mode)
+
+generate_clicked = st.button("✨ Generate Mind Map", disabled=not topic_seed)
+chart_placeholder = st.empty()
+
+generated_now = False
+if generate_clicked or regenerate:
     with st.spinner(f"Generating mind map for '{topic_seed}'..."):
         try:
-            markdown_output = generate_mind_map(topic_seed)
+            if animate_generation:
+                # Stream the response and show progress as lines complete
+                parser = OutlineParser(max_depth=max_depth, custom_root=custom_root, hide_leaf_nodes=hide_leaf_nodes, id_scheme=id_scheme)
+                chunks = []
+                received = 0
+                last_redraw = 0.0
+                redraw_interval = STREAM_REDRAW_INTERVAL
+                # Regenerate bypasses the response cache
+                for chunk in stream_mind_map(topic_seed, use_cache=not regenerate):
+                    chunks.append(chunk)
+                    added = parser.feed(chunk)
+                    received += added
+                    if added and time.monotonic() - last_redraw >= redraw_interval:
+                        started = time.monotonic()
+                        if render_backend == "Native Tree Layout":
+                            # Partial maps are drawn plainly; the reveal is played only for the finished map
+                            chart_placeholder.image(partial_tree_svg(
+                                parser.snapshot(), topic_seed, edge_routing=edge_routing,
+                                enable_clustering=enable_clustering, node_border_opacity=node_border_opacity,
+                                edge_opacity=edge_opacity, **style_options
+                            ))
+                        else:
+                            chart_placeholder.graphviz_chart(build_mind_map_digraph(parser.snapshot(), topic_seed, **style_options))
+                        last_redraw = time.monotonic()
+                        # Redraws of a growing map never take more than half of the stream's time
+                        redraw_interval = max(STREAM_REDRAW_INTERVAL, last_redraw - started)
+                markdown_output = "".join(chunks)
+            else:
+                # Regenerate bypasses the response cache
+                markdown_output = generate_mind_map(topic_seed, use_cache=not regenerate)
+            # Keep the outline a regeneration replaces so the new one can be diffed against it
+            previous_output = st.session_state.get("markdown_output")
+            same_topic = st.session_state.get("mind_map_topic") == topic_seed
+            st.session_state["previous_markdown_output"] = previous_output if regenerate and same_topic else None
             st.session_state["markdown_output"] = markdown_output  # Store in session state
-            graph, node_count = parse_markdown_to_graphviz(
-                markdown_output, topic_seed,
-                orientation=orientation,
-                font_size=font_size,
-                node_color=node_color,
-                max_depth=max_depth,
-                node_border_color=node_border_color,
-                node_border_width=node_border_width,
-                edge_color=edge_color,
-                edge_style=edge_style,
-                edge_arrow_size=edge_arrow_size,
-                node_shape=node_shape,
-                node_font=node_font,
-                node_font_color=node_font_color,
-                edge_font_color=edge_font_color,
-                edge_font_size=edge_font_size,
-                bg_color=bg_color,
-                custom_root=custom_root,
-                hide_leaf_nodes=hide_leaf_nodes
+            st.session_state["mind_map_topic"] = topic_seed
+            generated_now = True
+        except Exception as e:
+            st.error(f"An error occurred while generating the mind map: {e}")
+            st.info("This could be due to an invalid API key or a content safety issue from the model.")
+
+# Render the last generated map; style changes only rebuild the graph from the cached parse
+markdown_output = st.session_state.get("markdown_output")
+if markdown_output:
+    mind_map_topic = st.session_state.get("mind_map_topic", topic_seed)
+    try:
+        tree = parse_outline(
+            markdown_output, max_depth=max_depth, custom_root=custom_root, hide_leaf_nodes=hide_leaf_nodes, id_scheme=id_scheme
+        )
+        node_count = tree.node_count
+        previous_markdown = st.session_state.get("previous_markdown_output") if highlight_changes else None
+        # A freshly generated map is played back in generation order from its final layout
+        animate = animate_generation and generated_now
+        # Big maps are drawn to a shallow depth first; the preview is parsed, laid out and cached on its own
+        preview_depth = min(max_depth, LAYOUT_PREVIEW_DEPTH)
+        preview_tree = None
+        if progressive_rendering and not animate and node_count >= PROGRESSIVE_MIN_NODES:
+            preview_tree = parse_outline(
+                markdown_output, max_depth=preview_depth, custom_root=custom_root, hide_leaf_nodes=hide_leaf_nodes,
+                id_scheme=id_scheme
+            )
+            if preview_tree.node_count == node_count:
+                preview_tree = None
+        refine_note = st.empty()
+        graph = None
+        native_svg = None
+        layout_tier = None
+        if render_backend == "Native Tree Layout":
+            # Layout options pick the cached drawing; paint options only swap its <style> block
+            layout_inputs = dict(
+                style_options, edge_routing=edge_routing, enable_clustering=enable_clustering, animate_generation=animate
+            )
+            layout_args = {name: layout_inputs[name] for name in LAYOUT_OPTIONS}
+            paint_inputs = dict(style_options, node_border_opacity=node_border_opacity, edge_opacity=edge_opacity)
+            # font_size also sizes the nodes, so it is in both sets
+            paint = {name: paint_inputs[name] for name in PAINT_OPTIONS + ("font_size",)}
+            if preview_tree is not None:
+                chart_placeholder.image(restyle_svg(
+                    laid_out_tree_svg(
+                        markdown_output, mind_map_topic, preview_depth, custom_root, hide_leaf_nodes, id_scheme, **layout_args
+                    ),
+                    **paint
+                ))
+                refine_note.caption(f"Showing the first {preview_depth} levels while all {node_count} nodes are laid out...")
+            native_svg = restyle_svg(
+                laid_out_tree_svg(
+                    markdown_output, mind_map_topic, max_depth, custom_root, hide_leaf_nodes, id_scheme,
+                    **layout_args, previous_markdown=previous_markdown or ""
+                ),
+                reveal_step=reveal_step(node_count, node_animation_speed) if animate else None, **paint
+            )
+            if show_minimap:
+                # Both views come from the cached layout: the chart is cropped, the minimap downsampled
+                layout, _ = cached_tree_layout(tree, orientation, font_size, node_shape, edge_routing)
+                viewport = minimap_viewport(layout.size, minimap_zoom, minimap_center_x, minimap_center_y)
+                chart_placeholder.image(crop_svg(native_svg, viewport))
+                st.image(minimap_svg(layout, viewport, **style_options), caption="Minimap")
+            else:
+                chart_placeholder.image(native_svg)
+        elif graphviz_available():
+            # Lay out server-side under one deadline for the preview, every fallback tier and the SVG render
+            layout_deadline = time.monotonic() + LAYOUT_DEADLINE_SECONDS
+            if preview_tree is not None:
+                _, preview_graph = layout_with_deadline(
+                    preview_tree, mind_map_topic, deadline=layout_deadline - time.monotonic(), **style_options
+                )
+                chart_placeholder.image(render_graph(preview_graph, "svg", layout_deadline - time.monotonic()).decode("utf-8"))
+                refine_note.caption(f"Showing the first {preview_depth} levels while all {node_count} nodes are laid out...")
+            layout_tier, graph = layout_with_deadline(
+                tree, mind_map_topic, deadline=layout_deadline - time.monotonic(), **style_options
+            )
+            chart_placeholder.image(render_graph(graph, "svg", layout_deadline - time.monotonic()).decode("utf-8"))
+            if show_minimap:
+                st.caption("The minimap is drawn from native layout data; switch the renderer to Native Tree Layout to see it.")
+            if layout_tier != "full":
+                st.caption(f"The full layout did not finish within {LAYOUT_DEADLINE_SECONDS:g}s; showing the {layout_tier} rendering.")
+        else:
+            graph = build_mind_map_digraph(tree, mind_map_topic, **style_options)
+            chart_placeholder.graphviz_chart(graph)
+        refine_note.empty()
+        if graph is None:
+            # Still needed for the DOT download and the Graphviz exports
+            graph = build_mind_map_digraph(tree, mind_map_topic, **style_options)
+
+        if previous_markdown:
+            added, removed = outline_changes(
+                previous_markdown, markdown_output, max_depth, custom_root, hide_leaf_nodes, id_scheme
+            )
+            outlined = " New nodes are outlined in green." if native_svg is not None else ""
+            st.caption(f"Since the previous generation: {int(added.sum())} added, {len(removed)} removed.{outlined}")
+            if removed:
+                previous_tree = parse_outline(
+                    previous_markdown, max_depth=max_depth, custom_root=custom_root, hide_leaf_nodes=hide_leaf_nodes,
+                    id_scheme=id_scheme
+                )
+                with st.expander(f"Removed Nodes ({len(removed)})"):
+                    st.text("\n".join(" › ".join(previous_tree.label_path(index)) for index in removed[:DIFF_MAX_LISTED]))
+                    if len(removed) > DIFF_MAX_LISTED:
+                        st.caption(f"...and {len(removed) - DIFF_MAX_LISTED} more.")
+
+        # Show node count
+        if show_node_count:
+            st.info(f"Total nodes: {node_count}")
+
+        # Show/hide raw markdown
+        if show_markdown:
+            st.subheader("Raw Outline (Markdown)")
+            st.code(markdown_output, language="markdown")
+            st.button("Copy Markdown to Clipboard", on_click=lambda: st.session_state.update({"_clipboard": markdown_output}), key="copy_md")
+
+        # Show/hide export options
+        if show_export:
+            st.subheader("Export Options")
+            col1, col2, col3, col4, col5 = st.columns(5)
+            with col1:
+                st.download_button(
+                    label="Download Markdown",
+                    data=markdown_output,
+                    file_name=f"{mind_map_topic}_mindmap.md",
+                    mime="text/markdown"
+                )
+            with col2:
+                st.download_button(
+                    label="Download Graphviz DOT",
+                    data=graph.source,
+                    file_name=f"{mind_map_topic}_mindmap.dot",
+                    mime="text/vnd.graphviz"
+                )
+                st.button("Copy DOT to Clipboard", on_click=lambda: st.session_state.update({"_clipboard": graph.source}), key="copy_dot")
+            # Graph exports are rendered only on request and memoized for this session. On the
+            # native backend they are drawn from the chart's own layout; otherwise by Graphviz.
+            native = native_svg is not None
+            if native:
+                layout, routes = cached_tree_layout(tree, orientation, font_size, node_shape, edge_routing)
+                source_key = (
+                    layout_cache_key(tree, orientation, font_size, node_shape, edge_routing),
+                    repr(sorted(style_options.items()))
+                )
+            else:
+                source_key = RenderCache.make_key(graph, "exports", graph.engine)
+            rendered_exports = st.session_state.get("rendered_exports")
+            if not rendered_exports or rendered_exports["source"] != source_key:
+                rendered_exports = {"source": source_key, "data": {}}
+                st.session_state["rendered_exports"] = rendered_exports
+            export_columns = {"png": col3}
+            if export_pdf:
+                export_columns["pdf"] = col4
+            if export_svg and native:
+                # The native renderer already produced the SVG
+                col5.download_button(
+                    label=EXPORT_FORMATS["svg"][0],
+                    data=native_svg,
+                    file_name=f"{mind_map_topic}_mindmap.svg",
+                    mime=EXPORT_FORMATS["svg"][1]
+                )
+            elif export_svg:
+                export_columns["svg"] = col5
+            export_slots = {fmt: column.empty() for fmt, column in export_columns.items()}
+
+            requested = []
+            if not native and not graphviz_available():
+                for fmt, slot in export_slots.items():
+                    slot.info(
+                        GRAPHVIZ_INSTALL_HELP if fmt == "png"
+                        else f"Graphviz {fmt.upper()} export requires Graphviz installed on the server."
+                    )
+            else:
+                for fmt, slot in export_slots.items():
+                    if fmt not in rendered_exports["data"] and slot.button(f"Render {fmt.upper()}", key=f"render_{fmt}"):
+                        requested.append(fmt)
+                missing = [fmt for fmt in export_slots if fmt not in rendered_exports["data"]]
+                if len(missing) > 1 and st.button("Render All Exports", key="render_all_exports"):
+                    requested = missing
+
+            if requested:
+                rendered_exports["tier"] = layout_tier
+            if rendered_exports.get("tier") not in (None, "full"):
+                st.caption(
+                    f"Exports use the {rendered_exports['tier']} layout; the full layout did not finish within "
+                    f"{LAYOUT_DEADLINE_SECONDS:g}s."
+                )
+
+            # Render the requested formats and fill in each button as it finishes
+            for fmt in requested:
+                export_slots[fmt].caption("Rendering...")
+            def show_export_download(fmt, data):
+                label, mime = EXPORT_FORMATS[fmt]
+                export_slots[fmt].download_button(
+                    label=label,
+                    data=data,
+                    file_name=f"{mind_map_topic}_mindmap.{fmt}",
+                    mime=mime
+                )
+
+            exports = (
+                render_native_exports(tree, layout, routes, requested, **style_options) if native
+                else render_exports(graph, requested)
             )
-            st.graphviz_chart(graph)
-
-            # Show node count
-            if show_node_count:
-                st.info(f"Total nodes: {node_count}")
-
-            # Show/hide raw markdown
-            if show_markdown:
-                st.subheader("Raw Outline (Markdown)")
-                st.code(markdown_output, language="markdown")
-                st.button("Copy Markdown to Clipboard", on_click=lambda: st.session_state.update({"_clipboard": markdown_output}), key="copy_md")
-
-            # Show/hide export options
-            if show_export:
-                st.subheader("Export Options")
-                col1, col2, col3, col4, col5 = st.columns(5)
-                with col1:
+            for fmt, data, error in exports:
+                if error is not None:
+                    export_slots[fmt].error(f"{fmt.upper()} export failed: {error}")
+                elif data:
+                    rendered_exports["data"][fmt] = data
+                    show_export_download(fmt, data)
+
+            # Formats rendered on an earlier run keep their buttons
+            for fmt in export_slots:
+                if fmt not in requested and fmt in rendered_exports["data"]:
+                    show_export_download(fmt, rendered_exports["data"][fmt])
+
+            if export_html:
+                # Canvas page with a compressed layout payload; built only on request and memoized
+                layout, routes = cached_tree_layout(tree, orientation, font_size, node_shape, edge_routing)
+                html_key = (
+                    layout_cache_key(tree, orientation, font_size, node_shape, edge_routing), enable_node_collapse,
+                    custom_css, node_hover_color, repr(sorted(style_options.items()))
+                )
+                html_export = st.session_state.get("html_export")
+                if (not html_export or html_export["key"] != html_key) and st.button("Build Interactive HTML", key="build_html"):
+                    html_export = {"key": html_key, "data": build_html_export(
+                        tree, layout, routes, mind_map_topic, collapsible=enable_node_collapse, custom_css=custom_css,
+                        hover_color=node_hover_color, **style_options
+                    )}
+                    st.session_state["html_export"] = html_export
+                if html_export and html_export["key"] == html_key:
                     st.download_button(
-                        label="Download Markdown",
-                        data=markdown_output,
-                        file_name=f"{topic_seed}_mindmap.md",
-                        mime="text/markdown"
+                        label="Download Interactive HTML",
+                        data=html_export["data"],
+                        file_name=f"{mind_map_topic}_mindmap.html",
+                        mime="text/html"
                     )
-                with col2:
+
+            if export_high_res:
+                # Rasterized from the native layout in bands, so output size does not bound memory
+                layout, routes = cached_tree_layout(tree, orientation, font_size, node_shape, edge_routing)
+                scale = high_res_scale(layout.size, high_res_dpi, high_res_max_megapixels * 10**6)
+                high_res_key = (
+                    layout_cache_key(tree, orientation, font_size, node_shape, edge_routing), scale,
+                    repr(sorted(style_options.items()))
+                )
+                high_res = st.session_state.get("high_res_export")
+                if (not high_res or high_res["key"] != high_res_key) and st.button("Render High-Resolution PNG", key="render_high_res"):
+                    with st.spinner("Rendering high-resolution PNG..."):
+                        data = b"".join(iter_tree_png(tree, layout, routes, scale, **style_options))
+                    high_res = {"key": high_res_key, "data": data}
+                    st.session_state["high_res_export"] = high_res
+                if high_res and high_res["key"] == high_res_key:
+                    width, height = (int(np.ceil(extent * scale)) for extent in layout.size)
                     st.download_button(
-                        label="Download Graphviz DOT",
-                        data=graph.source,
-                        file_name=f"{topic_seed}_mindmap.dot",
-                        mime="text/vnd.graphviz"
+                        label=f"Download High-Resolution PNG ({width} x {height} px, {scale * 72:.0f} DPI)",
+                        data=high_res["data"],
+                        file_name=f"{mind_map_topic}_mindmap_high_res.png",
+                        mime="image/png"
                     )
-                    st.button("Copy DOT to Clipboard", on_click=lambda: st.session_state.update({"_clipboard": graph.source}), key="copy_dot")
-                with col3:
-                    try:
-                        import tempfile
-                        import os
-                        png_bytes = None
-                        with tempfile.TemporaryDirectory() as tmpdir:
-                            png_path = os.path.join(tmpdir, "mindmap.png")
-                            graph.render(filename=png_path, format="png", cleanup=True)
-                            with open(png_path + ".png", "rb") as f:
-                                png_bytes = f.read()
-                        if png_bytes:
-                            st.download_button(
-                                label="Download as PNG",
-                                data=png_bytes,
-                                file_name=f"{topic_seed}_mindmap.png",
-                                mime="image/png"
-                            )
-                    except Exception:
-                        st.info(
-                            "Graphviz PNG export requires Graphviz installed on the server.\n\n"
-                            "To enable PNG export, install Graphviz:\n"
-                            "- **Windows:** Download and install from https://graphviz.gitlab.io/_pages/Download/Download_windows.html and add Graphviz to your PATH.\n"
-                            "- **macOS:** Run `brew install graphviz` in Terminal.\n"
-                            "- **Linux (Debian/Ubuntu):** Run `sudo apt-get install graphviz`.\n"
-                            "- **Linux (Fedora):** Run `sudo dnf install graphviz`.\n"
-                            "After installation, restart your app/server."
-                        )
-                with col4:
-                    if export_pdf:
-                        try:
-                            import tempfile
-                            import os
-                            pdf_bytes = None
-                            with tempfile.TemporaryDirectory() as tmpdir:
-                                pdf_path = os.path.join(tmpdir, "mindmap.pdf")
-                                graph.render(filename=pdf_path, format="pdf", cleanup=True)
-                                with open(pdf_path + ".pdf", "rb") as f:
-                                    pdf_bytes = f.read()
-                            if pdf_bytes:
-                                st.download_button(
-                                    label="Download as PDF",
-                                    data=pdf_bytes,
-                                    file_name=f"{topic_seed}_mindmap.pdf",
-                                    mime="application/pdf"
-                                )
-                        except Exception:
-                            st.info("Graphviz PDF export requires Graphviz installed on the server.")
-                with col5:
-                    if export_svg:
-                        try:
-                            import tempfile
-                            import os
-                            svg_bytes = None
-                            with tempfile.TemporaryDirectory() as tmpdir:
-                                svg_path = os.path.join(tmpdir, "mindmap.svg")
-                                graph.render(filename=svg_path, format="svg", cleanup=True)
-                                with open(svg_path + ".svg", "rb") as f:
-                                    svg_bytes = f.read()
-                            if svg_bytes:
-                                st.download_button(
-                                    label="Download as SVG",
-                                    data=svg_bytes,
-                                    file_name=f"{topic_seed}_mindmap.svg",
-                                    mime="image/svg+xml"
-                                )
-                        except Exception:
-                            st.info("Graphviz SVG export requires Graphviz installed on the server.")
+                    if scale * 72 < high_res_dpi - 0.5:
+                        st.caption(f"Resolution reduced from {high_res_dpi} DPI to stay within {high_res_max_megapixels} megapixels.")
 
-        except Exception as e:
-            st.error(f"An error occurred while generating the mind map: {e}")
-            st.info("This could be due to an invalid API key or a content safety issue from the model.")
+    except Exception as e:
+        st.error(f"An error occurred while rendering the mind map: {e}")
 
 if ask_ai_button:
     if ai_question:
@@ -467,7 +3178,7 @@ if ask_ai_button:
             try:
                 st.info(f"AI is processing your question: '{ai_question}'...")
                 # Use the Gemini model to answer the question
-                model = genai.GenerativeModel('gemini-2.5-flash')
+                model = genai.GenerativeModel(MODEL_NAME)
                 prompt = f"Here is a mind map in markdown format:\n{markdown_output}\n\nAnswer the following question about the mind map:\n{ai_question}"
                 response = model.generate_content(prompt)
                 ai_response = response.text
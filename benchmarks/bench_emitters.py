@@ -0,0 +1,103 @@
+"""
+Benchmark: building the mind map through graphviz.Digraph vs. the streaming emitters.
+
+Compares, per outline size:
+  - Digraph.node()/Digraph.edge() calls followed by .source (the old path)
+  - iter_mind_map_dot streamed to a sink
+  - render_tree_svg, which joins every SVG chunk into one string
+  - iter_tree_svg streamed to a sink
+The native layout and edge routes are computed once per size, outside the
+timed region, so the two SVG cases measure only the emitter.
+
+Usage: python benchmarks/bench_emitters.py [NODE_COUNT ...] [--no-memory]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# app.py runs its Streamlit UI on import; in bare mode that is harmless but noisy.
+with contextlib.redirect_stderr(io.StringIO()):
+    import app  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+def synthetic_outline(node_count: int, fanout: int = 8) -> str:
+    """A deterministic outline with node_count nodes and the given fan-out per level."""
+    lines = ["- Root"]
+    index = 1
+    stack = [(0, 0)]  # (level, children so far)
+    while index < node_count:
+        level, children = stack[-1]
+        if children < fanout and level < 5:
+            stack[-1] = (level, children + 1)
+            lines.append("  " * (level + 1) + f"- Topic {index} Examples")
+            stack.append((level + 1, 0))
+            index += 1
+        else:
+            stack.pop()
+            if not stack:
+                stack = [(0, 0)]
+    return "\n".join(lines)
+
+def digraph_path(tree, topic, native):
+    dot = app._styled_digraph(tree, topic)
+    for index in range(len(tree)):
+        dot.node(tree.node_id(index), tree.label(index))
+        parent = tree.parents[index]
+        if parent >= 0:
+            dot.edge(tree.node_id(parent), tree.node_id(index))
+    return len(dot.source)
+
+def streamed_dot(tree, topic, native):
+    with open(os.devnull, "w") as sink:
+        for line in app.iter_mind_map_dot(tree, topic):
+            sink.write(line)
+
+def joined_svg(tree, topic, native):
+    return len(app.render_tree_svg(tree, native[0], topic, routes=native[1]))
+
+def streamed_svg(tree, topic, native):
+    with open(os.devnull, "w") as sink:
+        for chunk in app.iter_tree_svg(tree, native[0], topic, routes=native[1]):
+            sink.write(chunk)
+
+CASES = [
+    ("Digraph.node/edge + .source", digraph_path),
+    ("iter_mind_map_dot (streamed)", streamed_dot),
+    ("render_tree_svg (joined)", joined_svg),
+    ("iter_tree_svg (streamed)", streamed_svg),
+]
+
+def measure(fn, *args, memory=True):
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if memory:
+        tracemalloc.start()
+        fn(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+def main(argv):
+    memory = "--no-memory" not in argv
+    sizes = [int(arg) for arg in argv if not arg.startswith("--")] or DEFAULT_SIZES
+    print(f"{'nodes':>9}  {'case':<36} {'seconds':>8} {'peak MiB':>9}")
+    for size in sizes:
+        parser = app.OutlineParser(max_depth=10)
+        parser.feed(synthetic_outline(size))
+        tree = parser.finish()
+        layout = app.tidy_tree_layout(tree)
+        native = (layout, app.route_tree_edges(layout))
+        for name, fn in CASES:
+            elapsed, peak = measure(fn, tree, "Benchmark", native, memory=memory)
+            peak_text = f"{peak / 2 ** 20:9.1f}" if peak is not None else f"{'-':>9}"
+            print(f"{size:>9}  {name:<36} {elapsed:8.3f} {peak_text}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,91 @@
+"""
+Benchmark: Graphviz layout time per "Auto" policy tier, to set the LAYOUT_*_MAX_NODES thresholds.
+
+Times one layout run (positioned DOT output, as layout_graph does) per
+outline size for each tier choose_layout_policy can pick:
+  - dot with orthogonal edges     (up to LAYOUT_ORTHO_MAX_NODES)
+  - dot with polylines            (up to LAYOUT_SPLINE_MAX_NODES)
+  - dot with straight lines       (up to LAYOUT_DOT_MAX_NODES)
+  - sfdp with straight lines      (beyond that)
+The tier attributes come from choose_layout_policy itself, so the benchmark
+follows the policy as it changes. A tier stops at the first size that takes
+longer than the budget, and the largest size each tier finished within the
+budget is printed as a suggested threshold.
+
+Requires the Graphviz executables on PATH.
+
+Usage: python benchmarks/bench_layout_engines.py [NODE_COUNT ...] [--budget SECONDS]
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# app.py runs its Streamlit UI on import; in bare mode that is harmless but noisy.
+with contextlib.redirect_stderr(io.StringIO()):
+    import app  # noqa: E402
+import graphviz  # noqa: E402
+from bench_emitters import synthetic_outline  # noqa: E402
+
+DEFAULT_SIZES = [50, 100, 150, 300, 600, 1000, 2000, 5000, 10_000, 20_000]
+# Interactive target for one layout run; the app's hard limit is LAYOUT_DEADLINE_SECONDS
+DEFAULT_BUDGET_SECONDS = 2.0
+
+TIERS = [
+    ("dot ortho", "LAYOUT_ORTHO_MAX_NODES", app.choose_layout_policy(1, 0, "dot")),
+    ("dot polyline", "LAYOUT_SPLINE_MAX_NODES", app.choose_layout_policy(app.LAYOUT_ORTHO_MAX_NODES + 1, 0, "dot")),
+    ("dot line", "LAYOUT_DOT_MAX_NODES", app.choose_layout_policy(app.LAYOUT_SPLINE_MAX_NODES + 1, 0, "dot")),
+    ("sfdp line", None, app.choose_layout_policy(app.LAYOUT_DOT_MAX_NODES + 1, 0, "Auto")),
+]
+
+def time_layout(tree, policy, budget):
+    """Seconds for one layout run, None if it exceeded the budget, or the error if the engine failed."""
+    dot = app._new_mind_map_digraph("Benchmark", **policy)
+    dot.body.extend(app.iter_dot_body(tree))
+    start = time.perf_counter()
+    try:
+        app._run_graphviz(dot, policy["engine"], "dot", timeout=budget)
+    except subprocess.TimeoutExpired:
+        return None
+    except graphviz.CalledProcessError as e:
+        # e.g. sfdp's overlap removal in Graphviz builds without the triangulation library
+        return e
+    return time.perf_counter() - start
+
+def main(argv):
+    budget = DEFAULT_BUDGET_SECONDS
+    if "--budget" in argv:
+        index = argv.index("--budget")
+        budget = float(argv[index + 1])
+        del argv[index:index + 2]
+    sizes = sorted(int(arg) for arg in argv) or DEFAULT_SIZES
+    if not app.graphviz_available():
+        sys.exit("Graphviz executables not found on PATH")
+    print(f"{'nodes':>9}  {'tier':<14} {'seconds':>8}")
+    largest = {name: None for name, _, _ in TIERS}
+    stopped = set()
+    for size in sizes:
+        parser = app.OutlineParser(max_depth=10)
+        parser.feed(synthetic_outline(size))
+        tree = parser.finish()
+        for name, _, policy in TIERS:
+            if name in stopped:
+                continue
+            elapsed = time_layout(tree, policy, budget)
+            if elapsed is None or isinstance(elapsed, Exception):
+                stopped.add(name)
+                result = f"> {budget:g}" if elapsed is None else "failed"
+                print(f"{size:>9}  {name:<14} {result:>8}")
+            else:
+                largest[name] = size
+                print(f"{size:>9}  {name:<14} {elapsed:8.3f}")
+    print(f"\nLargest size laid out within {budget:g}s (suggested thresholds):")
+    for name, constant, _ in TIERS:
+        if constant is not None:
+            print(f"  {constant} = {largest[name]}  (currently {getattr(app, constant)})")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
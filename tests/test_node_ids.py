@@ -0,0 +1,56 @@
+"""
+Tests for NodeIdAllocator: IDs are unique and allocation stays linear on colliding labels.
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# app.py runs its Streamlit UI on import; in bare mode that is harmless but noisy.
+with contextlib.redirect_stderr(io.StringIO()):
+    import app  # noqa: E402
+
+LABELS = ["x", "x_1", "x_2", "X", "x 1", "x-1", "x_1_1", "Graph", "graph", "a b", "A_B", "a_b_1"]
+
+class CountingSet(set):
+    """Counts membership probes, the allocator's unit of work."""
+    probes = 0
+
+    def __contains__(self, item):
+        self.probes += 1
+        return super().__contains__(item)
+
+@pytest.mark.parametrize("scheme", ["readable", "path"])
+@pytest.mark.parametrize("seed", range(20))
+def test_ids_are_unique(scheme, seed):
+    rng = random.Random(seed)
+    allocator = app.NodeIdAllocator(scheme)
+    ids = [allocator.allocate(rng.choice(LABELS), occurrence=rng.randrange(2))[0] for _ in range(500)]
+    assert len(set(ids)) == len(ids)
+    assert all(app.re.fullmatch(r"\w+", node_id) for node_id in ids)
+
+def test_path_ids_depend_on_the_label_path():
+    first, second = app.NodeIdAllocator("path"), app.NodeIdAllocator("path")
+    root_id, root = first.allocate("Root")
+    child_id, _ = first.allocate("Child", root)
+    assert second.allocate("Root") == (root_id, root)
+    assert second.allocate("Child", root)[0] == child_id
+    _, other_root = second.allocate("Other")
+    assert second.allocate("Child", other_root)[0] != child_id
+    assert second.allocate("Child", root, occurrence=1)[0] != child_id
+
+def test_colliding_labels_take_linear_time():
+    k = 2000
+    allocator = app.NodeIdAllocator()
+    allocator._used = CountingSet()
+    for index in range(1, k + 1):
+        allocator.allocate(f"x_{index}")
+    ids = [allocator.allocate("x")[0] for _ in range(k)]
+    assert len(set(ids)) == k
+    assert not set(ids) & {f"x_{index}" for index in range(1, k + 1)}
+    # Probing from 1 for every "x" would take about k * k / 2 probes
+    assert allocator._used.probes <= 4 * k
@@ -0,0 +1,32 @@
+"""
+Tests for diff_outline_trees, which marks the nodes a regenerated outline added and removed.
+"""
+import contextlib
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# app.py runs its Streamlit UI on import; in bare mode that is harmless but noisy.
+with contextlib.redirect_stderr(io.StringIO()):
+    import app  # noqa: E402
+
+def diff(old_text, new_text):
+    added, removed = app.diff_outline_trees(app.parse_outline(old_text), app.parse_outline(new_text))
+    return added.tolist(), removed
+
+def test_unchanged_outline_has_no_changes():
+    text = "- Root\n  - A\n    - A1\n  - B"
+    assert diff(text, text) == ([False] * 4, [])
+
+def test_matching_ignores_case_and_whitespace():
+    assert diff("- Root\n  - Linked List", "- root\n  -  linked   LIST") == ([False, False], [])
+
+def test_renamed_node_takes_its_subtree():
+    added, removed = diff("- Root\n  - A\n    - A1\n  - B", "- Root\n  - C\n    - A1\n  - B")
+    assert added == [False, True, True, False]
+    assert removed == [1, 2]
+
+def test_repeated_sibling_labels_are_matched_by_occurrence():
+    assert diff("- R\n  - Ex\n  - Ex\n  - A", "- R\n  - Ex\n  - A") == ([False, False, False], [2])
+    assert diff("- R\n  - Ex\n  - A", "- R\n  - Ex\n  - Ex\n  - A") == ([False, False, True, False], [])
@@ -0,0 +1,97 @@
+"""
+Regression test: OutlineParser against the original whole-text parser.
+
+baseline_parse is the node/edge logic of the first parse_markdown_to_graphviz,
+minus the Graphviz calls. OutlineParser must produce the same node IDs,
+labels and parents for any outline, however the text is chunked.
+"""
+import contextlib
+import io
+import os
+import random
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# app.py runs its Streamlit UI on import; in bare mode that is harmless but noisy.
+with contextlib.redirect_stderr(io.StringIO()):
+    import app  # noqa: E402
+
+LABELS = ["Data", "Structures", "Tree", "B-Tree", "Graph", "Graph", "a b", "A_B", "a_b_1", "Queue & Stack", "Ünïcode"]
+
+def generate_unique_node_id(text, existing_ids):
+    base_id = re.sub(r'\W+', '_', text).lower()
+    node_id = base_id
+    counter = 1
+    while node_id in existing_ids:
+        node_id = f"{base_id}_{counter}"
+        counter += 1
+    return node_id
+
+def baseline_parse(markdown_text, max_depth=5, custom_root="", hide_leaf_nodes=False):
+    """Returns [(node_id, label, parent_id)] the way the original parser built them."""
+    nodes = []
+    lines = markdown_text.strip().split('\n')
+    parent_stack = []
+    existing_ids = set()
+    for idx, line in enumerate(lines):
+        if not line.strip():
+            continue
+        stripped_line = line.lstrip()
+        indentation = len(line) - len(stripped_line)
+        level = indentation // 2
+        if level >= max_depth:
+            continue
+        node_text = stripped_line.lstrip('- ').strip()
+        if custom_root and level == 0:
+            node_text = custom_root
+        node_id = generate_unique_node_id(node_text, existing_ids)
+        existing_ids.add(node_id)
+        if hide_leaf_nodes and idx + 1 < len(lines):
+            next_line = lines[idx + 1]
+            next_indentation = len(next_line) - len(next_line.lstrip())
+            next_level = next_indentation // 2
+            if next_level <= level:
+                continue
+        while parent_stack and parent_stack[-1][0] >= level:
+            parent_stack.pop()
+        nodes.append((node_id, node_text, parent_stack[-1][1] if parent_stack else None))
+        parent_stack.append((level, node_id))
+    return nodes
+
+def random_outline(rng, line_count):
+    lines = []
+    level = 0
+    for _ in range(line_count):
+        level = max(0, min(level + rng.choice((-2, -1, 0, 0, 1, 1, 2)), 6))
+        # Odd indents, blank and whitespace-only lines, and bullets without a space all occur in model output
+        lines.append(" " * (2 * level + (rng.random() < 0.1)) + rng.choice(("- ", "-", "")) + rng.choice(LABELS))
+        if rng.random() < 0.05:
+            lines.append(" " * rng.randrange(6))
+    return rng.choice(("", "\n", "  ")) + "\n".join(lines) + rng.choice(("", "\n", "\n\n  "))
+
+def parse_in_chunks(rng, text, **options):
+    parser = app.OutlineParser(**options)
+    start = 0
+    while start < len(text):
+        stop = start + rng.randrange(1, 40)
+        parser.feed(text[start:stop])
+        start = stop
+    tree = parser.finish()
+    return [
+        (tree.node_id(index), tree.label(index), tree.node_id(parent) if parent >= 0 else None)
+        for index, parent in enumerate(tree.parents)
+    ]
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_baseline_parser(seed):
+    rng = random.Random(seed)
+    text = random_outline(rng, rng.randrange(1, 60))
+    options = dict(
+        max_depth=rng.randrange(1, 8),
+        custom_root=rng.choice(("", "Custom Root")),
+        hide_leaf_nodes=rng.random() < 0.5,
+    )
+    assert parse_in_chunks(rng, text, **options) == baseline_parse(text, **options)
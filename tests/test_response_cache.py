@@ -0,0 +1,80 @@
+"""
+Tests for ResponseCache: TTL expiry and LRU eviction in the memory and SQLite tiers.
+"""
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# app.py runs its Streamlit UI on import; in bare mode that is harmless but noisy.
+with contextlib.redirect_stderr(io.StringIO()):
+    import app  # noqa: E402
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(app.time, "time", clock)
+    return clock
+
+def make_cache(tmp_path, **options):
+    return app.ResponseCache(str(tmp_path / "responses.sqlite3"), **options)
+
+def test_round_trip_survives_restart(tmp_path, clock):
+    key = app.ResponseCache.make_key("model", "prompt", {"temperature": 0})
+    make_cache(tmp_path).put(key, "- Root")
+    assert make_cache(tmp_path).get(key) == "- Root"
+    assert make_cache(tmp_path).get(app.ResponseCache.make_key("model", "prompt", {"temperature": 1})) is None
+
+def test_memory_tier_expires_after_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    cache._db = None
+    cache.put("a", "text")
+    clock.now += 60
+    assert cache.get("a") == "text"
+    clock.now += 1
+    assert cache.get("a") is None
+    assert "a" not in cache._memory
+
+def test_disk_tier_expires_after_ttl(tmp_path, clock):
+    make_cache(tmp_path, ttl_seconds=60).put("a", "text")
+    clock.now += 61
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    assert cache.get("a") is None
+    assert cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+
+def test_memory_tier_evicts_least_recently_used(tmp_path, clock):
+    cache = make_cache(tmp_path, max_memory_entries=2)
+    cache._db = None
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert list(cache._memory) == ["a", "c"]
+    assert cache.get("b") is None
+
+def test_disk_tier_evicts_least_recently_used(tmp_path, clock):
+    cache = make_cache(tmp_path, max_memory_entries=0, max_disk_entries=2)
+    cache.put("a", "1")
+    clock.now += 1
+    cache.put("b", "2")
+    clock.now += 1
+    assert cache.get("a") == "1"
+    clock.now += 1
+    cache.put("c", "3")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
+
+def test_disk_hit_refills_memory_tier(tmp_path, clock):
+    make_cache(tmp_path).put("a", "text")
+    cache = make_cache(tmp_path)
+    assert cache.get("a") == "text"
+    assert cache._memory["a"][1] == "text"
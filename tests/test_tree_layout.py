@@ -0,0 +1,102 @@
+"""
+Tests for the shortcuts the native tree layout takes (mirroring, per-branch
+caching): each must give the same layout as laying the map out directly.
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# app.py runs its Streamlit UI on import; in bare mode that is harmless but noisy.
+with contextlib.redirect_stderr(io.StringIO()):
+    import app  # noqa: E402
+
+def random_outline(seed, node_count=60):
+    rng = random.Random(seed)
+    lines = ["- Root"]
+    level = 0
+    for index in range(node_count - 1):
+        level = max(1, min(level + rng.choice((-1, 0, 1)), 4))
+        lines.append("  " * level + f"- Topic {index}" + " words" * rng.randrange(3))
+    return "\n".join(lines)
+
+def random_tree(seed, node_count=60):
+    return app.parse_outline(random_outline(seed, node_count), max_depth=6)
+
+@pytest.fixture
+def layout_cache(monkeypatch, tmp_path):
+    cache = app.RenderCache(disk_dir=str(tmp_path / "layouts"))
+    monkeypatch.setattr(app, "get_layout_cache", lambda: cache)
+    return cache
+
+def assert_same_layout(actual, expected):
+    (layout, routes), (expected_layout, expected_routes) = actual, expected
+    assert layout.rankdir == expected_layout.rankdir
+    np.testing.assert_allclose(layout.size, expected_layout.size)
+    for name in ("x", "y", "width", "height"):
+        np.testing.assert_allclose(getattr(layout, name), getattr(expected_layout, name), atol=1e-9)
+    np.testing.assert_array_equal(layout.depth, expected_layout.depth)
+    np.testing.assert_array_equal(routes.children, expected_routes.children)
+    np.testing.assert_allclose(routes.points, expected_routes.points, atol=1e-9)
+    np.testing.assert_allclose(routes.trunks, expected_routes.trunks, atol=1e-9)
+    np.testing.assert_array_equal(routes.trunk_parents, expected_routes.trunk_parents)
+
+def direct_layout(tree, orientation, node_shape, edge_routing):
+    layout = app.tidy_tree_layout(tree, orientation, node_shape=node_shape)
+    return layout, app.route_tree_edges(layout, edge_routing)
+
+@pytest.mark.parametrize("orientation", list(app.MIRRORED_ORIENTATIONS))
+@pytest.mark.parametrize("edge_routing", ["elbow", "bus", "straight"])
+@pytest.mark.parametrize("seed", range(3))
+def test_mirrored_layout_matches_direct_layout(layout_cache, orientation, edge_routing, seed):
+    tree = random_tree(seed)
+    expected = direct_layout(tree, orientation, "ellipse", edge_routing)
+    assert_same_layout(app.cached_tree_layout(tree, orientation, node_shape="ellipse", edge_routing=edge_routing), expected)
+    # Second call mirrors the source layout read back from the cache
+    assert_same_layout(app.cached_tree_layout(tree, orientation, node_shape="ellipse", edge_routing=edge_routing), expected)
+
+def assert_same_boxes(layout, expected):
+    assert layout.rankdir == expected.rankdir
+    np.testing.assert_allclose(layout.size, expected.size)
+    for name in ("x", "y", "width", "height"):
+        np.testing.assert_allclose(getattr(layout, name), getattr(expected, name), atol=1e-9)
+    np.testing.assert_array_equal(layout.depth, expected.depth)
+
+def count_puts(monkeypatch, cache):
+    keys = []
+    put = cache.put
+    monkeypatch.setattr(cache, "put", lambda key, data: (keys.append(key), put(key, data)))
+    return keys
+
+@pytest.mark.parametrize("orientation", ["Left-Right (LR)", "Top-Bottom (TB)"])
+@pytest.mark.parametrize("seed", range(3))
+def test_branch_layout_matches_tidy_layout(monkeypatch, layout_cache, orientation, seed):
+    monkeypatch.setattr(app, "BRANCH_LAYOUT_MIN_NODES", 1)
+    puts = count_puts(monkeypatch, layout_cache)
+    text = random_outline(seed, 200)
+    tree = app.parse_outline(text, max_depth=6)
+    expected = app.tidy_tree_layout(tree, orientation)
+    assert_same_boxes(app.branch_tidy_layout(tree, orientation), expected)
+    stored = len(puts)
+    assert stored > 1
+    # Every branch now comes from the cache
+    assert_same_boxes(app.branch_tidy_layout(tree, orientation), expected)
+    assert len(puts) == stored
+    # A longer label changes the first branch only
+    edited = app.parse_outline(text.replace("Topic 0", "Topic 0" + " renamed" * 5), max_depth=6)
+    assert_same_boxes(app.branch_tidy_layout(edited, orientation), app.tidy_tree_layout(edited, orientation))
+    assert len(puts) == stored + 1
+
+def test_unfinished_last_branch_is_not_cached(monkeypatch, layout_cache):
+    monkeypatch.setattr(app, "BRANCH_LAYOUT_MIN_NODES", 1)
+    puts = count_puts(monkeypatch, layout_cache)
+    tree = random_tree(0, 200)
+    app.branch_tidy_layout(tree, store=False)
+    stored = len(puts)
+    app.branch_tidy_layout(tree)
+    assert len(puts) == stored + 1
@@ -0,0 +1,51 @@
+"""
+Regression test: iter_tree_png drawn in bands matches the same map drawn as one band.
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# app.py runs its Streamlit UI on import; in bare mode that is harmless but noisy.
+with contextlib.redirect_stderr(io.StringIO()):
+    import app  # noqa: E402
+
+def random_tree(seed, node_count=40):
+    rng = random.Random(seed)
+    lines = ["- Root"]
+    level = 0
+    for index in range(node_count - 1):
+        level = max(1, min(level + rng.choice((-1, 0, 1)), 4))
+        lines.append("  " * level + f"- Topic {index}" + " words" * rng.randrange(3))
+    return app.parse_outline("\n".join(lines), max_depth=6)
+
+def decode(chunks):
+    return np.asarray(Image.open(io.BytesIO(b"".join(chunks))).convert("RGB"))
+
+CASES = [
+    ("Left-Right (LR)", "box", "elbow", 1.0),
+    ("Top-Bottom (TB)", "hexagon", "bus", 0.5),
+    ("Bottom-Top (BT)", "diamond", "straight", 1.3),
+    ("Right-Left (RL)", "ellipse", "elbow", 0.7),
+    ("Radial", "circle", "straight", 0.7),
+]
+
+@pytest.mark.parametrize("orientation, node_shape, edge_routing, scale", CASES)
+@pytest.mark.parametrize("budget_rows", [8, 400])
+def test_banded_png_matches_single_band(monkeypatch, orientation, node_shape, edge_routing, scale, budget_rows):
+    tree = random_tree(len(orientation) + budget_rows)
+    layout, routes = app.cached_tree_layout(tree, orientation, 12, node_shape, edge_routing)
+    style = dict(node_shape=node_shape, edge_style="bold", node_border_width=3, watermark_text="Watermark")
+    monkeypatch.setattr(app, "HIGH_RES_BAND_PIXELS", 1 << 40)
+    whole = decode(app.iter_tree_png(tree, layout, routes, scale, **style))
+    # The budget covers a band and its overscan rows; small budgets give the minimum band height
+    monkeypatch.setattr(app, "HIGH_RES_BAND_PIXELS", whole.shape[1] * budget_rows)
+    banded = decode(app.iter_tree_png(tree, layout, routes, scale, **style))
+    assert banded.shape == whole.shape
+    assert int((banded != whole).any(axis=2).sum()) == 0